@@ -12,13 +12,31 @@
 # %%
 # ----- Load libraries -----
 
+import argparse
+import asyncio
+import bisect
 import csv
+import json
+import multiprocessing
+import random
 import re
+import sqlite3
+import threading
+import time
+import unicodedata
+from contextlib import contextmanager
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, Future, ProcessPoolExecutor, ThreadPoolExecutor, wait
 from datetime import datetime
+from urllib.parse import urljoin, urlparse
+import lxml.etree
+import lxml.html
 from selenium import webdriver
 from selenium.webdriver.firefox.options import Options
 from selenium.common.exceptions import NoSuchElementException # turns out we're not using this but may use this in future iterations of this script.
 from selenium.common.exceptions import StaleElementReferenceException
+from selenium.common.exceptions import InvalidArgumentException, InvalidSessionIdException, NoSuchWindowException, TimeoutException, WebDriverException
+import urllib3 # comes with selenium, which talks to geckodriver with it
 from selenium.webdriver.support.ui import WebDriverWait
 from selenium.webdriver.support import expected_conditions as EC
 from selenium.webdriver.common.by import By
@@ -30,53 +48,652 @@ deptListFile = r"" # CSV file with following header fields: fullName,firstName,f
 outputScheduleHTML = r""
 geckoPath = r""
 ignored_exceptions=(StaleElementReferenceException) # This is good practice for ignoring stale references in Selenium but I honestly don't know if it's really necessary here.
+fetchEngine = "selenium" # "selenium" renders every page in headless Firefox. "http" (EXPERIMENTAL) skips the browser entirely and requests the same meetingapp.cgi pages with an http client, which is much faster and needs the aiohttp library, but only works if the website sends back the rendered lists for those requests. That hasn't been checked against the real confex site, only against the stand-in in the benchmark folder. Pages that don't have the lists on them fail and are listed at the end of the run.
+meetingURL = "https://agu.confex.com/agu/fm21/meetingapp.cgi" # base of the meeting website that all the search URLs are built from. Point this at a local stub server to test the script without hitting the real confex site.
+numBrowsers = 4 # number of headless Firefox sessions to scrape with at once. Each one is a separate Firefox process so, depending on how much memory you have, the number of cores on your machine is a good place to start.
+numParsers = 0 # number of processes to parse the fetched pages with. 0 parses them in the main script, which is plenty for a department sized list. Only works on systems that can fork processes (Linux and Mac), otherwise pages are always parsed in the main script.
+leanBrowsing = False # selenium engine only: if True, Firefox doesn't wait for images, fonts and trackers to load, and instead of sitting out the full 30 or 300 second waits below it stops as soon as a page shows one of leanEmptyClasses and learns how long pages actually take to load
+leanEmptyClasses = [] # CSS classes the meeting website uses to show a page has nothing on it, e.g. a "no results" message. Look these up in the web inspector on the real meeting website, since a wrong guess can make a page that's still loading look empty. Lean browsing stops waiting on a page as soon as it shows one, and a search or profile page is only read as having nothing on it if it has its list of results or one of these.
+httpConcurrency = 16 # http engine only: the most requests that are allowed to be in flight to the confex site at once
+httpTimeout = 60 # http engine only: seconds to wait for a page before giving up on it
+requestsPerSecond = 10 # the most pages a second that will be asked for from any one website, whichever engine is used. 0 for no limit.
+requestBurst = 10 # how many pages can be asked for all at once before requestsPerSecond kicks in
+maxRetries = 3 # how many more times a page is tried after it fails with something that might go away on its own (a dropped connection, a timeout, the server saying it's busy or the browser crashing). Pages that fail with something that won't, like page not found or a talk page that never shows its time, aren't tried again.
+retryBaseSeconds = 2 # about how long to wait before the 1st retry of a page. The wait is doubled for every retry after that, up to retryMaxSeconds.
+retryMaxSeconds = 60
+adaptiveConcurrency = True # if True, starts out with a couple of pages going at once and works up to numBrowsers / httpConcurrency while pages keep coming back quickly, and halves the number going at once whenever the website slows down or starts failing
+slowdownFactor = 3 # adaptive concurrency only: a page taking this many times longer than usual for its phase counts as the website slowing down
+pageCacheFile = r"" # SQLite file to keep a cache of every page fetched in, so reruns only fetch what has changed. Leave blank to fetch everything fresh every run.
+pageCacheHours = {'search': 24, 'profile': 1, 'talk': 24} # how many hours a cached page is good for in each phase before it is fetched again
+pageCacheMaxMB = 50 # least recently used pages are thrown out of the cache once it gets bigger than this
+refreshChangedTalksOnly = False # if True, only talks whose listing on a profile page is new or has changed get refetched, and every other talk page is taken from the cache no matter how old it is
+affiliationPatternsFile = r"" # text file with one regular expression per line (case insensitive) for the affiliations that count as your institution. Lines starting with # are ignored. Leave blank to use the UMass / WHOI / USGS patterns in the search section below.
+discoveryMode = "perPerson" # "perPerson" runs a search for every person in deptListFile. "bulk" instead searches once for each of the discoverySearchTerms below, pages through all of the results and matches the whole department against them in one go, which is a lot fewer page loads for a big department.
+discoverySearchTerms = ["Massachusetts", "WHOI", "US Geological Survey"] # bulk discoveryMode only: searches that between them should turn up everyone at your institution
+discoveryMaxPages = 50 # bulk discoveryMode only: the most pages of results that will be gone through for any one search term
+searchPageSize = 50 # number of results asked for on each page of search results. This used to be 10, which meant anyone past the first 10 hits for a name was missed.
+runProfileFile = r"" # JSON file to write a report of how long every page and every step of the run took to. A short table of it is printed at the end either way.
+batchJobs = [] # batch mode: a list of jobs to run all at once instead of the single deptListFile / outputScheduleHTML above, which is easiest to give in a --config file. Each job is a dictionary with "deptListFile" and "outputScheduleHTML", and optionally "meeting" (e.g. "agu/fm22", on the same website as meetingURL) or "meetingURL", "affiliationPatternsFile" or "affiliationPatterns" (a list of them) and "discoverySearchTerms". Anything left out is taken from the parameters above.
+checkpointFile = r"" # SQLite file that every finished search, profile and talk page is written to as soon as it's done. If the script dies partway through, run it again with --resume to pick up where it left off. Leave blank to not keep checkpoints.
 timezone = "EST" # for use in writing out HTML. This is your local timezone of the computer you're running this script from. The confex site interacts with this script in such a way where it only displays events in your local time, not the timezone of the conference.
 # ... therefore, the output of this script will only show event time in your local timezone. You can fix this with a fancy datetime function at the end if you want.
 
-# NOTE: not paramaterizing here because it feels too complicated to do so but boolean logic for which institution your authors are at is in the if statement on line 123 or thereabouts.
-# This willl likely be different for each institution, and you might have to write some very complicated logic if your authors have differing affiliations from one another or
-# like in our case, there are multiple spellings and abbreviations for your instituion.
+# NOTE: which institution your authors are at is decided by the affiliation patterns below. These will likely be different for each institution, and you might have to
+# write quite a few of them if your authors have differing affiliations from one another or like in our case, there are multiple spellings and abbreviations for your instituion.
 
 # NOTE: Be sure to check your CSV for errors. If it is missing a column for one person, you may get a NoneType error thrown on line 83.  If the name is spelt wrong, no talks may appear for that person.
 
+# Command line options. parse_known_args() is used so this doesn't choke on the arguments Jupyter / VS Code pass in when running the script cell by cell.
+argParser = argparse.ArgumentParser(description="Scrape the AGU meeting website for talks by the people in deptListFile")
+argParser.add_argument("--resume", action="store_true", help="skip every page already finished in checkpointFile by an earlier run and only redo failed or missing ones")
+argParser.add_argument("--config", help="JSON file of parameter names and values that override the ones above, e.g. {\"deptListFile\": \"dept.csv\", \"numBrowsers\": 8}")
+args, unknownArgs = argParser.parse_known_args()
+
+# Only these can be set from a --config file, so a typo or a name like "csv" can't overwrite a library or the script's own state
+parameterNames = ['deptListFile', 'outputScheduleHTML', 'geckoPath', 'fetchEngine', 'meetingURL', 'numBrowsers', 'numParsers', 'leanBrowsing', 'leanEmptyClasses',
+                  'httpConcurrency', 'httpTimeout', 'requestsPerSecond', 'requestBurst', 'maxRetries', 'retryBaseSeconds', 'retryMaxSeconds', 'adaptiveConcurrency',
+                  'slowdownFactor', 'pageCacheFile', 'pageCacheHours', 'pageCacheMaxMB', 'refreshChangedTalksOnly', 'affiliationPatternsFile', 'discoveryMode',
+                  'discoverySearchTerms', 'discoveryMaxPages', 'searchPageSize', 'runProfileFile', 'batchJobs', 'checkpointFile', 'timezone']
+
+if args.config:
+    with open(args.config) as configFile:
+        for parameter, value in json.load(configFile).items():
+            if parameter not in parameterNames:
+                print("\n-----* !!! Aborting script. {} in {} isn't one of the parameters of this script.".format(parameter, args.config))
+                import sys
+                sys.exit()
+            globals()[parameter] = value
+
+runStarted = time.time()
+
 print("libraries loaded")
 
 # %%
-# Initialize selenium and headless browser
+# Timing everything the script does
+
+# Every browser startup, driver.get(), wait, http request and page parse below is timed, per phase and per URL, along with how many exceptions each phase
+# ran into. At the end of the script this is printed out as a short table and, if runProfileFile is set, written out as a JSON report, so you can see
+# where the time goes on a slow run and whether changing any of the parameters above actually helped.
+runProfileLock = threading.Lock()
+stepTimes = {} # phase: {step: [seconds, ...]}
+pageTimes = {} # (phase, url): {step: seconds}
+exceptionCounts = {} # phase: {exception name: count}
+
+def recordTime(phase, step, seconds, url=None):
+    with runProfileLock:
+        stepTimes.setdefault(phase, {}).setdefault(step, []).append(seconds)
+        if url is not None:
+            page = pageTimes.setdefault((phase, url), {})
+            page[step] = page.get(step, 0) + seconds
+
+@contextmanager
+def timed(phase, step, url=None):
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        recordTime(phase, step, time.perf_counter() - started, url)
+
+def countException(phase, e):
+    name = e if isinstance(e, str) else type(e).__name__
+    with runProfileLock:
+        exceptionCounts.setdefault(phase, {})[name] = exceptionCounts.setdefault(phase, {}).get(name, 0) + 1
+
+# %%
+# Initialize selenium and headless browsers
 
 options = Options()
 options.headless = True # run Firefox headless so it does not load up its GUI
 options.add_argument("--window-size=1920,1200")
 
 profile = webdriver.FirefoxProfile()
-driver = webdriver.Firefox(options=options, executable_path=geckoPath) # set path to the gecko driver that drives Firefox. Gecko can be downloaded from https://github.com/mozilla/geckodriver
-print("Loaded gecko driver for headless Firefox browser")
+if leanBrowsing:
+    options.page_load_strategy = "eager" # driver.get() comes back once the html is ready instead of waiting on every image and stylesheet. The waits below take care of the rest.
+    profile.set_preference("permissions.default.image", 2) # no images
+    profile.set_preference("gfx.downloadable_fonts.enabled", False) # no web fonts
+    profile.set_preference("media.autoplay.default", 5) # no video or audio
+    profile.set_preference("privacy.trackingprotection.enabled", True) # no analytics or other trackers
+    profile.set_preference("browser.cache.disk.enable", False)
+    options.profile = profile
+    # NOTE: stylesheets are left alone since the waits below need to know whether elements are actually visible on the page
+
+# A single webdriver can't be driven from several threads at once, so every worker thread in the pool below lazily starts up its own headless Firefox session
+# the first time it needs one and keeps reusing it for every page it is handed after that.
+browserLocal = threading.local()
+browserList = [] # every driver that gets started, so they can all be shut down at the end of the script
+browserListLock = threading.Lock()
+
+def getDriver():
+    if not hasattr(browserLocal, "driver"):
+        with timed("browser", "startup"):
+            browserLocal.driver = webdriver.Firefox(options=options, executable_path=geckoPath) # set path to the gecko driver that drives Firefox. Gecko can be downloaded from https://github.com/mozilla/geckodriver
+        with browserListLock:
+            browserList.append(browserLocal.driver)
+            print("Loaded gecko driver for headless Firefox browser #{}".format(len(browserList)))
+    return browserLocal.driver
+
+# If a Firefox session crashes or gets closed, every page its thread is handed after that would fail the same way, so the session is thrown away and
+# the next page (or the retry of the one it died on) starts up a fresh one.
+deadSessionMessages = ["Failed to decode response from marionette", "Tried to run command without establishing a connection", "Browsing context has been discarded", "Process unexpectedly closed"]
+
+def isDeadSession(e):
+    # Whether e means the Firefox session (or the geckodriver behind it) is gone
+    return isinstance(e, (InvalidSessionIdException, NoSuchWindowException, ConnectionError, urllib3.exceptions.HTTPError)) or any(message in str(e) for message in deadSessionMessages)
+
+def resetDriver():
+    # Quits this thread's Firefox session, if it has one, so that getDriver() starts a fresh one next time
+    driver = browserLocal.__dict__.pop("driver", None)
+    if driver is None:
+        return
+    with browserListLock:
+        browserList.remove(driver)
+    try:
+        driver.quit()
+    except Exception:
+        pass # it's already dead
+    print("Threw away a dead headless Firefox browser")
+
+# Lean browsing waits. Rather than a fixed WebDriverWait per page, the page is checked every quarter second with a single bit of javascript (one round
+# trip to geckodriver instead of several) for whether what we're waiting for is there, or whether the page is showing one of leanEmptyClasses. A page
+# that has finished loading and gone quiet is still waited on, since the meeting website fills its pages in with separate requests after the page
+# itself has loaded, and those can take a while when the site is busy. How long to wait before giving up is worked out from how long pages in the
+# same phase have actually taken so far, so that one dead page doesn't cost five minutes.
+leanPageCheck = """
+var ready = Array.prototype.slice.call(document.getElementsByClassName(arguments[0]));
+var visible = ready.filter(function (e) { return e.getClientRects().length > 0; });
+if (ready.length > 0 && (arguments[1] ? visible.length == ready.length : visible.length > 0)) { return "ready"; }
+for (var i = 0; i < arguments[2].length; i++) { if (document.getElementsByClassName(arguments[2][i]).length > 0) { return "empty"; } }
+return false;
+"""
+
+pageLatencies = {'search': [], 'profile': [], 'talk': []} # seconds that pages which loaded fine took, by phase
+pageLatenciesLock = threading.Lock()
+
+def leanTimeout(phase, ceiling):
+    # Waits up to 4 times the slowest 95% of pages seen so far in this phase (but never less than 10 seconds or more than the old fixed wait) once there's enough to go on
+    with pageLatenciesLock:
+        observed = sorted(pageLatencies[phase])
+    if len(observed) < 5:
+        return ceiling
+    return min(ceiling, max(10, 4 * observed[int(0.95 * (len(observed) - 1))]))
+
+waitTimedOutClass = "scraperWaitTimedOut" # put on a page by the selenium engine after waiting the whole time for a profile that has nothing on it
+
+def waitForPage(driver, phase, readyClass, allVisible, ceiling):
+    # Waits until elements with the class readyClass are visible on the page (all of them if allVisible, otherwise any of them), same as the old
+    # WebDriverWait did. With lean browsing, also stops early on pages that show one of leanEmptyClasses. Returns "ready" or "empty", or "timedOut" if
+    # the whole of ceiling went by without either, meaning the page loaded but hasn't got what we were waiting for on it. A shorter learned lean
+    # browsing wait running out raises TimeoutException instead, since that may just be the website being slow.
+    if not leanBrowsing:
+        try:
+            if allVisible:
+                WebDriverWait(driver, ceiling).until(EC.visibility_of_all_elements_located((By.CLASS_NAME, readyClass)))
+            else:
+                WebDriverWait(driver, ceiling).until(EC.visibility_of_element_located((By.CLASS_NAME, readyClass)))
+        except TimeoutException:
+            return "timedOut"
+        return "ready"
+
+    started = time.time()
+    timeout = leanTimeout(phase, ceiling)
+    pageState = lambda driver: driver.execute_script(leanPageCheck, readyClass, allVisible, leanEmptyClasses)
+    try:
+        state = WebDriverWait(driver, timeout, poll_frequency=0.25, ignored_exceptions=ignored_exceptions).until(pageState)
+    except TimeoutException:
+        if timeout < ceiling:
+            raise
+        return "timedOut"
+    if state == "ready":
+        with pageLatenciesLock:
+            pageLatencies[phase].append(time.time() - started)
+    else:
+        print("\nNothing on " + driver.current_url)
+    return state
+
+browserPool = ThreadPoolExecutor(max_workers=numBrowsers) # pool of worker threads, one Firefox session each, that the search, profile and talk loops below hand their pages to
+if fetchEngine == "selenium":
+    print("Started pool of {} headless Firefox workers".format(numBrowsers))
+
+# %%
+# Page fetching for both engines
+
+# Every page the script visits goes through submitPage() below. With the selenium engine each page is handed to a worker in browserPool, which loads it
+# in its own Firefox session and grabs the rendered html of the page in one go. With the (experimental) http engine there is no browser at all: the same
+# meetingapp.cgi URLs are requested with an asyncio http client, running in a background thread, that keeps one pool of keep-alive connections open for
+# the whole run and never has more than httpConcurrency requests in flight. This assumes the website answers those requests with the rendered lists
+# rather than the javascript shell of the page, which hasn't been checked against the real confex site. If it doesn't, the parsers below fail every
+# page rather than reading it as empty. Either way the html is then read locally with lxml, so both engines give back the exact same dictionaries and
+# nothing downstream of submitPage() needs to know which one was used.
+
+if fetchEngine == "http":
+    import aiohttp # only needed for the http engine
+
+httpHeaders = {
+    "User-Agent": "AGU-Scraping (https://github.com/geojoek/AGU-Scraping)",
+    "X-Requested-With": "XMLHttpRequest", # in the hope that meetingapp.cgi sends back what the front end loads rather than the javascript shell of the page
+}
+
+# Fetch scheduling. Every page that actually gets fetched, by either engine, goes through the same three things:
+#  - a token bucket for each website, so that no more than requestsPerSecond pages a second (after a burst of requestBurst) are asked for from it
+#  - retrying pages that failed with something that might go away on its own, after a wait that doubles with every try and is picked at random up to
+#    that ("full jitter") so a bunch of pages that failed together don't all come back at the same moment. If the server says how long to wait, that's used.
+#  - an additive increase / multiplicative decrease (AIMD) controller, the same idea as TCP's congestion control, that sets how many pages the pipeline
+#    below keeps going at once. It goes up by one for every round of pages that came back at their usual speed and is cut in half whenever one failed
+#    in a way that might go away or took slowdownFactor times longer than usual.
+# All of this is shared by the browser threads and the http engine's event loop, so it is kept behind locks.
+rateBuckets = {} # website: [tokens left, when it was last topped up]
+rateLock = threading.Lock()
+
+def rateLimitDelay(url):
+    # Takes a token out of the bucket for url's website and returns how many seconds to wait before asking for the page. The bucket goes negative
+    # when it runs out, which lines the pages that are waiting up one after another at requestsPerSecond.
+    if requestsPerSecond <= 0:
+        return 0
+    with rateLock:
+        now = time.monotonic()
+        bucket = rateBuckets.setdefault(urlparse(url).netloc, [requestBurst, now])
+        bucket[0] = min(requestBurst, bucket[0] + (now - bucket[1]) * requestsPerSecond) - 1
+        bucket[1] = now
+        return max(0, -bucket[0] / requestsPerSecond)
+
+transientStatuses = {408, 425, 429, 500, 502, 503, 504} # http status codes for timeouts and busy or broken servers, which are worth trying again
+
+def isTransient(e):
+    # Whether a page that failed with e might load fine if it's tried again
+    status = getattr(e, "status", None) # http engine errors come with the status code
+    if status is not None:
+        return status in transientStatuses
+    if isDeadSession(e): # tried again in a fresh browser
+        return True
+    if isinstance(e, InvalidArgumentException): # badly formed URL
+        return False
+    return isinstance(e, (TimeoutError, asyncio.TimeoutError, ConnectionError, WebDriverException)) or (fetchEngine == "http" and isinstance(e, aiohttp.ClientError))
+
+def retryDelay(phase, url, e, attempt):
+    # Returns how many seconds to wait before trying url again after try number attempt (counting from 0) failed with e, or None to give up on it
+    if attempt >= maxRetries or not isTransient(e):
+        return None
+    retryAfter = (getattr(e, "headers", None) or {}).get("Retry-After", "")
+    if retryAfter.isdigit():
+        delay = min(retryMaxSeconds, int(retryAfter))
+    else:
+        delay = random.uniform(0, min(retryMaxSeconds, retryBaseSeconds * 2 ** attempt))
+    recordTime(phase, "backoff", delay, url)
+    print("Trying {} again in {:.1f} seconds".format(url, delay))
+    return delay
+
+maxInFlight = numBrowsers if fetchEngine == "selenium" else httpConcurrency # the most pages that are ever going at once
+concurrencyLimit = min(2, maxInFlight) if adaptiveConcurrency else maxInFlight # how many pages are going at once right now
+concurrencyLock = threading.Lock()
+slowStart = True # until the first cut, concurrencyLimit goes up by one for every page that comes back (doubling every round) so it gets up to speed quickly
+lastCut = 0 # time.monotonic() of the last cut
+usualLatencies = {phase: deque(maxlen=50) for phase in ('search', 'profile', 'talk')} # seconds the last pages to come back in each phase took
+
+def fetchFeedback(phase, started, seconds, failed):
+    # Tells the concurrency controller how a fetch that started at started went: it either came back fine or failed in a way that might go away. Pages
+    # that fail for good say nothing about how the website is coping, and neither do retries, so that one broken page doesn't cut things down on every try.
+    global concurrencyLimit, slowStart, lastCut
+    if not adaptiveConcurrency:
+        return
+    with concurrencyLock:
+        usual = sorted(usualLatencies[phase])
+        slow = len(usual) >= 10 and seconds > slowdownFactor * usual[len(usual) // 2]
+        if not failed:
+            usualLatencies[phase].append(seconds)
+        if failed or slow:
+            if started > lastCut and concurrencyLimit > 1: # pages that were already going when the last cut happened ran into the same slowdown, so they don't cut it again
+                concurrencyLimit = max(1, concurrencyLimit / 2)
+                slowStart = False
+                lastCut = time.monotonic()
+                print("\n{} is {}, cutting down to {} pages at once".format(urlparse(meetingURL).netloc, "failing" if failed else "slowing down", int(concurrencyLimit)))
+        else:
+            concurrencyLimit = min(maxInFlight, concurrencyLimit + (1 if slowStart else 1 / concurrencyLimit))
+
+async def openHTTPSession():
+    connector = aiohttp.TCPConnector(limit=httpConcurrency, keepalive_timeout=60) # connections are kept open and reused between requests
+    return aiohttp.ClientSession(connector=connector, timeout=aiohttp.ClientTimeout(total=httpTimeout)), asyncio.Semaphore(httpConcurrency)
+
+def startHTTPClient():
+    # Starts the http engine's event loop in a background thread so pages can be handed to it one at a time from the main script
+    global httpLoop, httpSession, httpSemaphore
+    httpLoop = asyncio.new_event_loop()
+    threading.Thread(target=httpLoop.run_forever, daemon=True).start()
+    httpSession, httpSemaphore = asyncio.run_coroutine_threadsafe(openHTTPSession(), httpLoop).result()
+
+def stopHTTPClient():
+    asyncio.run_coroutine_threadsafe(httpSession.close(), httpLoop).result()
+    httpLoop.call_soon_threadsafe(httpLoop.stop)
+
+async def fetchPageHTTP(phase, url, finish):
+    html = None
+    for attempt in range(maxRetries + 1):
+        await asyncio.sleep(rateLimitDelay(url))
+        async with httpSemaphore:
+            started = time.monotonic()
+            try:
+                with timed(phase, "get", url):
+                    async with httpSession.get(url, headers=httpHeaders) as response:
+                        response.raise_for_status()
+                        print("\nLoading " + url)
+                        html = await response.text()
+                fetchFeedback(phase, started, time.monotonic() - started, False)
+                break
+            except Exception as e:
+                countException(phase, e)
+                print("{} on ".format(e) + url)
+                if isTransient(e) and attempt == 0:
+                    fetchFeedback(phase, started, time.monotonic() - started, True)
+                delay = retryDelay(phase, url, e, attempt)
+        if delay is None:
+            break
+        await asyncio.sleep(delay) # outside of the semaphore so other pages can go out in the meantime
+    return await asyncio.get_running_loop().run_in_executor(None, finish, html) # parsed off in a thread so the next requests can go out in the meantime
+
+# What gets pulled off of every page is also saved in an SQLite page cache keyed by URL (if pageCacheFile is set), so that rerunning the script
+# during meeting week only fetches pages whose cached copy is older than that phase's entry in pageCacheHours.
+# Pages finish on the browser threads (or the http engine's parsing threads), so every use of the SQLite files below goes through storeLock.
+storeLock = threading.Lock()
+
+pageCache = None
+if pageCacheFile:
+    pageCache = sqlite3.connect(pageCacheFile, check_same_thread=False)
+    pageCache.execute("CREATE TABLE IF NOT EXISTS pages (url TEXT PRIMARY KEY, phase TEXT, fetched REAL, used REAL, size INTEGER, content TEXT)")
+
+def cacheGet(url, maxHours=None):
+    # Returns cached content for url, or None if it isn't cached or is older than maxHours. maxHours=None takes the cached copy no matter how old it is.
+    if pageCache is None:
+        return None
+    with storeLock:
+        row = pageCache.execute("SELECT fetched, content FROM pages WHERE url = ?", (url,)).fetchone()
+        if row is None or (maxHours is not None and time.time() - row[0] > maxHours * 3600):
+            return None
+        pageCache.execute("UPDATE pages SET used = ? WHERE url = ?", (time.time(), url))
+    return json.loads(row[1])
+
+def cachePut(phase, url, content):
+    if pageCache is None:
+        return
+    content = json.dumps(content)
+    with storeLock:
+        pageCache.execute("INSERT OR REPLACE INTO pages VALUES (?, ?, ?, ?, ?, ?)", (url, phase, time.time(), time.time(), len(content), content))
+        pageCache.commit() # right away, so a run that gets killed partway through still keeps every page it fetched (and the last used times from cacheGet)
+
+def cacheEvict():
+    # Throws out the least recently used pages until the cache is back under pageCacheMaxMB
+    if pageCache is None:
+        return
+    with storeLock:
+        total = pageCache.execute("SELECT COALESCE(SUM(size), 0) FROM pages").fetchone()[0]
+        if total > pageCacheMaxMB * 1024 * 1024:
+            for url, size in pageCache.execute("SELECT url, size FROM pages ORDER BY used").fetchall():
+                pageCache.execute("DELETE FROM pages WHERE url = ?", (url,))
+                total = total - size
+                if total <= pageCacheMaxMB * 1024 * 1024:
+                    break
+        pageCache.commit()
+
+# Checkpoint store. Unlike the page cache, which is about not fetching pages again between separate runs, this keeps track of which pages this run has
+# finished (or failed on), written and committed one page at a time so that it survives the browser or the script dying. A fresh run starts with an
+# empty store; a run with --resume takes every page marked done from it and only fetches the failed or missing ones.
+checkpoint = None
+if checkpointFile:
+    checkpoint = sqlite3.connect(checkpointFile, check_same_thread=False)
+    checkpoint.execute("PRAGMA journal_mode=WAL")
+    checkpoint.execute("CREATE TABLE IF NOT EXISTS units (phase TEXT, url TEXT, status TEXT, content TEXT, updated REAL, PRIMARY KEY (phase, url))")
+    if not args.resume:
+        checkpoint.execute("DELETE FROM units")
+    checkpoint.commit()
+elif args.resume:
+    print("\n-----* --resume needs checkpointFile to be set in the parameters section. Starting from scratch.")
+
+def checkpointGet(phase, url):
+    # Returns the content of a page finished by an earlier run that's being resumed, or None if it wasn't finished
+    if checkpoint is None or not args.resume:
+        return None
+    with storeLock:
+        row = checkpoint.execute("SELECT content FROM units WHERE phase = ? AND url = ? AND status = 'done'", (phase, url)).fetchone()
+    return None if row is None else json.loads(row[0])
+
+def checkpointPut(phase, url, content):
+    # Marks a page as done (with what was pulled off of it) or as failed if content is None
+    if checkpoint is None:
+        return
+    with storeLock:
+        checkpoint.execute("INSERT OR REPLACE INTO units VALUES (?, ?, ?, ?, ?)", (phase, url, "failed" if content is None else "done", json.dumps(content), time.time()))
+        checkpoint.commit()
+
+def loadPageOrNone(phase, loadPage, url):
+    # Loads url with loadPage (selenium engine), going through the fetch scheduling above, and returns its html or None if it couldn't be loaded
+    for attempt in range(maxRetries + 1):
+        time.sleep(rateLimitDelay(url))
+        started = time.monotonic()
+        try:
+            getDriver() # starting up Firefox (the first time, or after a dead session was thrown away) isn't the website being slow, so it's done before the clock starts
+            started = time.monotonic()
+            html = loadPage(url)
+            if waitTimedOutClass not in html: # a profile read as empty after the whole wait ran out took as long as it was allowed to, not as long as the website took
+                fetchFeedback(phase, started, time.monotonic() - started, False)
+            return html
+        except Exception as e:
+            countException(phase, e)
+            print("{} on ".format(e) + url)
+            if isTransient(e) and attempt == 0:
+                fetchFeedback(phase, started, time.monotonic() - started, True)
+            if isDeadSession(e):
+                resetDriver()
+            delay = retryDelay(phase, url, e, attempt)
+            if delay is None:
+                return None
+            time.sleep(delay)
+
+def finishPage(phase, parsePage, url, html):
+    # Parses one page as soon as it has been fetched and records it in the page cache and checkpoint store right away, so nothing is lost if the script dies partway through a phase
+    with timed(phase, "parse", url):
+        if parsePool is None:
+            content = parsePageOrNone(parsePage, html, url)
+        else:
+            content = parsePool.submit(parsePageOrNone, parsePage, html, url).result()
+    if html is not None and content is None:
+        countException(phase, "ParseError")
+    if content is not None:
+        cachePut(phase, url, content)
+    checkpointPut(phase, url, content)
+    return content
+
+phaseCounts = {phase: {'resumed': 0, 'cached': 0, 'fetched': 0} for phase in ('search', 'profile', 'talk')} # how each phase's pages were come by, for the summary at the end
+
+def submitPage(phase, url, loadPage, parsePage, refresh=None):
+    # Starts getting one page and returns a Future for what parsePage pulls off of it, which is None if the page failed. The page is loaded with loadPage
+    # (selenium engine) or the http client (http engine), unless it is already done in the checkpoint store of a resumed run or fresh enough in the page
+    # cache. refresh=True always fetches the page again and refresh=False takes it from the cache no matter how old it is (see refreshChangedTalksOnly).
+    content = checkpointGet(phase, url)
+    if content is not None:
+        phaseCounts[phase]['resumed'] = phaseCounts[phase]['resumed'] + 1
+    else:
+        if refresh is None:
+            content = cacheGet(url, pageCacheHours[phase])
+        elif not refresh:
+            content = cacheGet(url)
+        if content is not None:
+            phaseCounts[phase]['cached'] = phaseCounts[phase]['cached'] + 1
+            checkpointPut(phase, url, content)
+    if content is not None:
+        future = Future()
+        future.set_result(content)
+        return future
+
+    phaseCounts[phase]['fetched'] = phaseCounts[phase]['fetched'] + 1
+    finish = lambda html: finishPage(phase, parsePage, url, html)
+    if fetchEngine == "http":
+        return asyncio.run_coroutine_threadsafe(fetchPageHTTP(phase, url, finish), httpLoop)
+    return browserPool.submit(lambda: finish(loadPageOrNone(phase, loadPage, url)))
+
+# %%
+# Reading the fields we need out of the html of each page
+
+# All of the pages, whichever engine loaded them, are read locally with lxml by the functions below. Reading the html locally is a lot quicker than
+# Selenium's .find_element...() methods, each of which is a separate round trip to geckodriver (and a chance at a StaleElementReferenceException).
+# That used to be five to eight round trips for every paper on a profile page.
+
+def classXPath(className, below=""):
+    # Compiles lxml version of Selenium's .find_elements_by_class_name(), optionally followed by more XPath for elements below it. Matches className as one of
+    # the space delimited classes in the class attribute (see the CSS weirdness note below). These are compiled once up front rather than on every page.
+    return lxml.etree.XPath("descendant-or-self::*[contains(concat(' ', normalize-space(@class), ' '), ' {} ')]".format(className) + below) # -or-self so it also works on bits of pages that lxml hands back as the element itself
+
+findLinks = lxml.etree.XPath(".//a")
+findSpans = lxml.etree.XPath(".//span")
+
+def elementText(element):
+    # lxml version of Selenium's .text, which collapses all the whitespace in the element down to single spaces
+    return " ".join(element.text_content().split())
+
+findEmptyMarkers = [classXPath(className) for className in leanEmptyClasses + [waitTimedOutClass]]
+
+def requireList(page, findList, className):
+    # Makes sure a page has the list it's meant to have (the same element the selenium engine waits for) or says it has nothing on it (one of
+    # leanEmptyClasses, or waitTimedOutClass from loadProfilePage). Otherwise it
+    # isn't the page we were after, e.g. the javascript shell of the page or an error page, and reading it as having nothing on it would quietly lose
+    # everyone on it, so it's raised as an error and the page counts as failed.
+    if len(findList(page)) < 1 and not any(len(findEmpty(page)) > 0 for findEmpty in findEmptyMarkers):
+        raise ValueError("No {} on the page".format(className))
+
+def parsePageOrNone(parsePage, html, url):
+    if html is None:
+        return None
+    try:
+        return parsePage(html, url)
+    except Exception as e:
+        print("{} on ".format(e) + url)
+        return None
+
+# Search results page: list of dictionaries of name, affiliation and aguProfileURL
+findPersonListItems = classXPath("PersonListItem") # all people that come up in the 1st page of this search
+findPersonNameLinks = classXPath("name", "//a")
+findAffiliations = classXPath("affiliation")
+findSearchResultLists = classXPath("searchResults")
+
+def parseSearchResults(html, searchURL):
+    page = lxml.html.fromstring(html)
+    requireList(page, findSearchResultLists, "searchResults")
+    searchResults = []
+    for result in findPersonListItems(page):
+        try:
+            link = findPersonNameLinks(result)[0]
+            searchResults.append({
+                'name': elementText(link), # retrieves author name for that search result entry as shown in AGU. Necessary because same person may have multiple AGU author profile URLs if they've been listed as co-author on someone else's abstract.
+                'affiliation': elementText(findAffiliations(result)[0]), # retrieves author affiliation for that search result entry
+                'aguProfileURL': urljoin(searchURL, link.get("href")),
+            })
+        except Exception as e:
+            print(e)
+    return searchResults
+
+# Profile page: dictionary with a list of 'sessions' (url and title) and a list of 'papers' (url, title, the bolded first presenter and the talk number)
+findSessionListItems = classXPath("SessionListItem") # if person is chairing a session or workshop
+findEntryContentLinks = classXPath("entryContent", "//a")
+findPaperListItems = classXPath("PaperListItem") # if it's a talk, poster, INNOVATIONS talk, etc...
+findFirstPresenters = classXPath("topDisplay", "//b") # the first presenter's name is encased in an html <b> tag
+findProfileEntryLists = classXPath("field_ParentList_Entry")
+
+def parseProfileEntries(html, aguProfileURL):
+    page = lxml.html.fromstring(html)
+    requireList(page, findProfileEntryLists, "field_ParentList_Entry")
+    profileEntries = {'sessions': [], 'papers': []}
+    for x in findSessionListItems(page):
+        link = findEntryContentLinks(x)[0]
+        profileEntries['sessions'].append({'url': urljoin(aguProfileURL, link.get("href")), 'title': elementText(link)})
+
+    for x in findPaperListItems(page):
+        bold = findFirstPresenters(x)
+        if len(bold) < 1:
+            continue # no first presenter listed, so nobody can be first author on this one
+        link = findLinks(x)[0]
+        span = findSpans(link) # paper number listed before talk title
+        profileEntries['papers'].append({
+            'firstAuthors': elementText(bold[0]),
+            'url': urljoin(aguProfileURL, link.get("href")),
+            'title': elementText(link),
+            'talkNumber': elementText(span[0]) if span else None,
+        })
+    return profileEntries
+
+# Talk page: dictionary of talkDateRaw, talkTimeRaw and talkLocation
+findSlotDates = classXPath("SlotDate")
+findSlotTimes = classXPath("SlotTime")
+findPropertyNames = classXPath("propertyName")
+
+def parseTalkSlot(html, talkURL):
+    page = lxml.html.fromstring(html)
+    # scraping the date and time
+    return {
+        'talkDateRaw': elementText(findSlotDates(page)[0]),
+        'talkTimeRaw': elementText(findSlotTimes(page)[0]),
+        'talkLocation': elementText(findPropertyNames(page)[0]),
+    }
+
+# Pages are parsed in a pool of forked processes if numParsers is set. The pool is started up here, once all of the parsing functions above exist
+# but before any of the browser threads do, since forking a process that has other threads running is asking for trouble.
+parsePool = None
+if numParsers > 0 and "fork" in multiprocessing.get_all_start_methods():
+    parsePool = ProcessPoolExecutor(max_workers=numParsers, mp_context=multiprocessing.get_context("fork"))
+    parsePool.submit(len, "").result() # makes the pool fork its worker processes now
+    print("Started pool of {} page parsing processes".format(numParsers))
 
 # %%
 # Load dept. members CSV and create either list or dictionary based off it
 
+# Normally there is just the one job, made from the parameters above. In batch mode batchJobs lists several, each with its own meeting, roster CSV,
+# affiliation patterns and output file. Everyone on every roster is read into the one deptPeopleList below along with which job they're on, and they
+# all go through the same pipeline, so the browsers are only started once for the whole batch and a search, profile or talk page that more than one
+# job needs is only fetched once. Each job still gets its own schedule written out at the end.
+if len(batchJobs) > 0:
+    jobs = [dict(job) for job in batchJobs]
+else:
+    jobs = [{'deptListFile': deptListFile, 'outputScheduleHTML': outputScheduleHTML}]
+
+# Every job is checked before anything is fetched, so a typo doesn't cost a whole run (or quietly fall back to the UMass affiliation patterns)
+jobKeys = ['deptListFile', 'outputScheduleHTML', 'meeting', 'meetingURL', 'affiliationPatternsFile', 'affiliationPatterns', 'discoverySearchTerms']
+for j, job in enumerate(jobs):
+    problems = ["{} isn't one of {}".format(key, ", ".join(jobKeys)) for key in job if key not in jobKeys]
+    problems = problems + ["{} is missing".format(key) for key in ['deptListFile', 'outputScheduleHTML'] if not job.get(key)]
+    if len(problems) > 0:
+        print("\n-----* !!! Aborting script. Job #{} in batchJobs: {}.".format(j + 1, "; ".join(problems)))
+        import sys
+        sys.exit()
+
+for job in jobs:
+    if 'meeting' in job:
+        job['meetingURL'] = urljoin(meetingURL, "/{}/meetingapp.cgi".format(job['meeting'].strip("/")))
+    job.setdefault('meetingURL', meetingURL)
+    job.setdefault('affiliationPatternsFile', affiliationPatternsFile)
+    job.setdefault('discoverySearchTerms', discoverySearchTerms)
+
 # The following section reads a CSV file of all people in the department and parses that into a dictionary that can be iterated through.
 # The CSV file I use has a specific structure: fullName, firstName, firstInitial, lastName as column headers and that's what the following block of code parses. The first line is fieldnames.
 
-with open(deptListFile) as inputFile:
-    reader = csv.DictReader(inputFile) # parses csv file into lsit of dictionaries. One dictionary per line
-    deptPeopleList = list(reader) # because running loops against above dictionary is a file i/o operaton, creating list of dictionaries out of the above
-    # this creates list wherein each list item is a dictionary where the key/value pairs are the column headers:value of the above dictionary / CSV file.
-    print("CSV file read into Python dictionary")
+deptPeopleList = []
+errorFlag = False
+for j, job in enumerate(jobs):
+    with open(job['deptListFile']) as inputFile:
+        reader = csv.DictReader(inputFile) # parses csv file into lsit of dictionaries. One dictionary per line
+        jobPeopleList = list(reader) # because running loops against above dictionary is a file i/o operaton, creating list of dictionaries out of the above
+        # this creates list wherein each list item is a dictionary where the key/value pairs are the column headers:value of the above dictionary / CSV file.
+        print("CSV file {} read into Python dictionary".format(job['deptListFile']))
 
-print("\nChecking CSV file for errors....")
+    print("\nChecking CSV file for errors....")
 
-# This block of code very crudely checks for errors in the CSV file and aborts script if it finds any
-n = 1 # Can't start at 0 since 1st line of file is column names
-errorFlag = False
-for person in deptPeopleList:
-    n = n + 1
-    for key,value in person.items():
-        if value == None or value == "":
-            errorFlag = True
-            print("Error on line {} of CSV".format(n))
-        else:
-            pass
+    # This block of code very crudely checks for errors in the CSV file and aborts script if it finds any
+    n = 1 # Can't start at 0 since 1st line of file is column names
+    for person in jobPeopleList:
+        n = n + 1
+        for key,value in person.items():
+            if value == None or value == "":
+                errorFlag = True
+                print("Error on line {} of {}".format(n, job['deptListFile']))
+            else:
+                pass
+        person['job'] = j # position in jobs of the job this person is on
+    deptPeopleList.extend(jobPeopleList)
 if errorFlag:
     print("\n-----* !!! Aborting script. Please fix errors in CSV file.")
     import sys
@@ -88,8 +705,6 @@ else:
 # %%
 # Iterate though dept. members dictionary and plug into into AGU Search URL to use requests library retrieve page consisting of names that match
 
-print("\n\n ----- Iterating through list of people in {} and seeing if they have a profile in the AGU database... -----\n\n".format(deptListFile))
-
 # Creates list object to place dept members in who are authors on an AGU abstract or are conveners of a session, etc....
 # Each list item will be a dictionary in which to dump all the info. that comes of for them on the AGU confex website. These dictionaries will,
 # in turn, have nested dictionaries for each talk.
@@ -97,164 +712,404 @@ print("\n\n ----- Iterating through list of people in {} and seeing if they have
 # This is needed because using deptPeopleList as a master list of dictionaries ends up skipping department members who may be listed multiple times
 # under slightly different names or affiliations in the AGU database
 
-authorList = []
+# Each search result below is read into a dictionary of name, affiliation and aguProfileURL
+def loadSearchPage(searchURL): # selenium engine
+    driver = getDriver()
+    with timed("search", "get", searchURL):
+        driver.get(searchURL) # This loads up the the search results page for the dept. member's name.
+    print("\nLoading " + searchURL)
 
-for person in deptPeopleList: # list but querying key/value pairs as if it were a dictionary
-    searchURL = "https://agu.confex.com/agu/fm21/meetingapp.cgi/Search/0?sort=Relevance&size=10&page=1&searchterm={}&ModelType=Person".format(person['firstName'] + " " + person['lastName']) # Concatenates first name and last name persons in file to ignore middle initial, which may cause problems in search URL
-    person['searchURL'] = searchURL
+    with timed("search", "wait", searchURL):
+        if waitForPage(driver, "search", r"searchResults", False, 30) == "timedOut": # waits until search results are actually loaded before proceeding with scraping page
+            raise TimeoutException("searchResults never showed up")
+    return driver.page_source
 
-    try:
-        driver.get(person['searchURL']) # This loads up the the search results page for the dept. member's name.
-        print("\nLoading " + person['searchURL'])
+# The matching below is done against an index that is built once up front instead of with a pile of .lower() substring checks on every search result.
+# Names are boiled down to lowercase ascii words (so accents, middle initials, hyphens and punctuation don't get in the way), and every dept. member is
+# filed in nameIndex under the last word of their last name. A search result only has to look up each word of its name in nameIndex to find every
+# dept. member it could be, which is what lets the "bulk" discoveryMode below match the whole department against big pages of results at once.
+# The affiliation patterns for each job are all compiled into one regular expression.
 
-        WebDriverWait(driver, 30).until(EC.visibility_of_element_located((By.CLASS_NAME, r"searchResults"))) # waits until search results are actually loaded before proceeding with scraping page
-        searchResults = driver.find_elements_by_class_name("PersonListItem") # searches the loaded page for all people that come up in the 1st page of this search
-        if len(searchResults) < 1:
-            print("\n " + person['fullName'] + " isn't returning any search results")
-        else:
-            aguAuthor = False # resets flag as to whether or not person is an author at AGU for use below so I don't have to retype whole booleaen logic below:
-
-            for result in searchResults:
-                try:
-                    name = result.find_element_by_class_name("name").find_element_by_tag_name("a").text # retrieves author name for that search result entry as shown in AGU. Necessary because same person may have multiple AGU author profile URLs if they've been listed as co-author on someone else's abstract.
-                    affiliation = result.find_element_by_class_name("affiliation").text # retrieves author affiliation for that search result entry
-                except Exception as e:
-                    print(e)
-                if (person['lastName'].lower() in name.lower() and person['firstName'].lower() in name.lower()) and ("mass" in affiliation.lower() or "whoi" in affiliation.lower() or "US Geological Survey" in affiliation): # tests to see if it's really a UMass result. WHOI is because there are some UMass people who very recently went to WHOI
-                    # the in / and / (or in) syntax and .lower() method above is pretty critical for catching all permutations of mass and for catching WHOI. Any other way of doing it will miss quite a few people.
-                    aguAuthor = True
-                    dictionary = {}
-                    dictionary['name'] = name # This feels so redundant but ends up being necessary in several places below as getting the person's name from the dictionary name ends up being a pain
-                    aguProfileURL = result.find_element_by_class_name("name").find_element_by_tag_name("a").get_attribute("href")
-                    dictionary['aguProfileURL'] = aguProfileURL # adds this field to the dictionary for this result
-                    authorList.append(dictionary) # adds the dictionary for this person's name to the list
-                    print("\n" + name + " - " + dictionary['aguProfileURL'])
-                    # print("\n" + name + " - " + affiliation + " - " + dictionary['aguProfileURL']) # use this line if you are searching for person's affiliaton.
-                else: # handler for if person is not at UMass
-                    continue # i.e, don't do anything and start if loop over with next person
-
-            if not aguAuthor:
-                print("\n" + person['fullName'] + " doesn't appear to be an author on anything happening at AGU this year")
+def nameWords(name):
+    name = unicodedata.normalize("NFKD", name).encode("ascii", "ignore").decode("ascii") # strips accents, e.g. ñ to n
+    return re.findall(r"[a-z]+", name.lower())
+
+nameIndex = {}
+for i, person in enumerate(deptPeopleList):
+    firstWords = nameWords(person['firstName'])
+    lastWords = nameWords(person['lastName'])
+    if len(lastWords) > 0:
+        nameIndex.setdefault(lastWords[-1], []).append((i, firstWords, lastWords))
+
+def matchPeople(name):
+    # Returns the positions in deptPeopleList of every dept. member that a search result's name could be
+    words = nameWords(name)
+    matched = []
+    for word in words:
+        for i, firstWords, lastWords in nameIndex.get(word, []):
+            if i in matched:
                 continue
+            # the whole last name has to be there but the first name only has to be the start of a word, the same as the old substring test, so Rob still finds Robert
+            if all(w in words for w in lastWords) and all(any(w.startswith(f) for w in words) for f in firstWords):
+                matched.append(i)
+    return matched
 
-    except Exception as e:
-        print("{} on ".format(e) + searchURL)
+for job in jobs:
+    if 'affiliationPatterns' in job:
+        affiliationPatterns = job['affiliationPatterns']
+    elif job['affiliationPatternsFile']:
+        with open(job['affiliationPatternsFile']) as patternsFile:
+            affiliationPatterns = [line.strip() for line in patternsFile if line.strip() != "" and not line.startswith("#")]
+    else:
+        affiliationPatterns = [r"mass", r"whoi", r"US Geological Survey"] # UMass in all its spellings. WHOI is because there are some UMass people who very recently went to WHOI
+    affiliationPatterns = [pattern for pattern in affiliationPatterns if pattern.strip() != ""]
+    if len(affiliationPatterns) == 0: # an empty pattern matches every affiliation, so everyone with a matching name would be counted as being in the department
+        print("\n-----* !!! Aborting script. The affiliation patterns for {} are empty. Please give at least one.".format(job['outputScheduleHTML']))
+        import sys
+        sys.exit()
+    job['affiliationRegex'] = re.compile("|".join("(?:{})".format(pattern) for pattern in affiliationPatterns), re.IGNORECASE)
+
+def authorDictionary(result):
+    dictionary = {}
+    dictionary['name'] = result['name'] # This feels so redundant but ends up being necessary in several places below as getting the person's name from the dictionary name ends up being a pain
+    dictionary['aguProfileURL'] = result['aguProfileURL'] # adds this field to the dictionary for this result
+    print("\n" + dictionary['name'] + " - " + dictionary['aguProfileURL'])
+    # print("\n" + dictionary['name'] + " - " + result['affiliation'] + " - " + dictionary['aguProfileURL']) # use this line if you are searching for person's affiliaton.
+    return dictionary
+
+def matchSearchResults(i, searchResults):
+    # Returns a list of dictionaries for every search result that is really dept. member number i in deptPeopleList
+    person = deptPeopleList[i]
+    matches = []
+    if len(searchResults) < 1:
+        print("\n " + person['fullName'] + " isn't returning any search results")
+        return matches
+
+    for result in searchResults:
+        if jobs[person['job']]['affiliationRegex'].search(result['affiliation']) and i in matchPeople(result['name']): # tests to see if it's really a UMass result
+            matches.append(authorDictionary(result)) # adds the dictionary for this person's name to the list of matches
+        else: # handler for if person is not at UMass
+            continue # i.e, don't do anything and start if loop over with next person
+
+    if len(matches) < 1:
+        print("\n" + person['fullName'] + " doesn't appear to be an author on anything happening at AGU this year")
+    return matches
+
+def searchURL(meetingURL, searchTerm, pageNumber):
+    return meetingURL + "/Search/0?sort=Relevance&size={}&page={}&searchterm={}&ModelType=Person".format(searchPageSize, pageNumber, searchTerm)
 
 # %%
 # Now go through dept. members who are presenting, access their agu profile pages, and scrape presentations they are part of to dump into dictionary.
 
-print("\n\n ----- Now going through list of people found to be authors and retrieving info. related to ther talks. -----\n")
-
 # Loads AGU profile page for each person, which contains a list of presentations / events they are listed as an author or convener of in the AGU database
-for person in authorList: # remember that we set this up as a list object of separate dictionary objects for each person so person variable here is a dictionary with the name of the person *from the AGU database* retrieved above    else:
-    person['talks'] = {} # creates nested dictionary for talks for each person
-    print("\n\nRetrieving primary author submissions for " + person['name'] + "\n")
-    try:
-            driver.get(person['aguProfileURL'])
-            WebDriverWait(driver, 300).until(EC.visibility_of_all_elements_located((By.CLASS_NAME, r"field_ParentList_Entry"))) # waits until search results are actually loaded before proceeding with scraping page
-            # print("Page Loaded...")
-    except Exception as e:
-        print("{} on ".format(e) + person['aguProfileURL'])
-# %%
+
+# NOTE: do not get burned by CSS weirdness! In web inspector, the following class names are listed as class="SessionListItem WORKSHOPS    ", class="PaperListItem T", and class="PaperListItem INNOVATIONS"
+# but remember that in CSS spaces DO NOT EXIST in css attributes and are, instead, used as delimiters, so all of those denote MULTIPLE CSS CLASSES
+# and Selenium's .find_element...() methods don't work on multiple class names or attributes if you list them as they are listed in the browser's web inspector. EVIL! EVILLLLLLL!!!!
+# Instead, use .find_element...() methods on the first class name listed in the quotes.
+# yes... I lost hours trying to troubleshoot this. :-)
+
+# Each profile page is read into a dictionary with a list of 'sessions' (url and title) and a list of 'papers' (url, title, the bolded first presenter and the talk number)
+def loadProfilePage(aguProfileURL): # selenium engine
+    driver = getDriver()
+    with timed("profile", "get", aguProfileURL):
+        driver.get(aguProfileURL)
+    with timed("profile", "wait", aguProfileURL):
+        state = waitForPage(driver, "profile", r"field_ParentList_Entry", True, 300) # waits until search results are actually loaded before proceeding with scraping page
+    # print("Page Loaded...")
+    if state == "timedOut":
+        # A profile with nothing on it (e.g. everything on it was withdrawn) never shows field_ParentList_Entry. After the full wait the page is read as
+        # having nothing on it, the same as it always was, and marked as such so parseProfileEntries takes it as empty (and it's cached) instead of failed.
+        print("Nothing on " + aguProfileURL)
+        html = driver.page_source
+        position = html.rfind("</body>")
+        position = len(html) if position < 0 else position
+        return html[:position] + '<div class="{}"></div>'.format(waitTimedOutClass) + html[position:]
+    return driver.page_source
+
+def buildTalks(person, profileEntries):
     # This block of code iterates through all of the submissions on the person's AGU profile and checks if the person first author on that presentaion / session
-    # and either skips if not or then retrieves information about that presentation / session and puts it in the appropriate key/value pair in the dictionary
-    # item for that name in authorList[name]
+    # and either skips if not or then retrieves information about that presentation / session and puts it in the appropriate key/value pair in the
+    # nested dictionary of talks, keyed by talk URL, that gets returned for this person
+    talks = {}
+    for x in profileEntries['sessions']:
+        talkURL = x['url']
+        talks[talkURL] = {} # creates another nested dictionary to put all info for this talk in
+        talks[talkURL]['talkType'] = "Convening Session"
+        talks[talkURL]['title'] = x['title']
+        talks[talkURL]['firstAuthorName'] = person['name'] # copies the person's name from authorList to put in this nested dictionary for each talk.
 
-    # NOTE: do not get burned by CSS weirdness! In web inspector, the following class names are listed as class="SessionListItem WORKSHOPS    ", class="PaperListItem T", and class="PaperListItem INNOVATIONS"
-    # but remember that in CSS spaces DO NOT EXIST in css attributes and are, instead, used as delimiters, so all of those denote MULTIPLE CSS CLASSES
-    # and Selenium's .find_element...() methods don't work on multiple class names or attributes if you list them as they are listed in the browser's web inspector. EVIL! EVILLLLLLL!!!!
-    # Instead, use .find_element...() methods on the first class name listed in the quotes.
-    # yes... I lost hours trying to troubleshoot this. :-)
+    for x in profileEntries['papers']:
+        # check to see if person is primary author / presenting and, if so, puts talk information into dictionary for this person.
+        # There's no publicly visible flag / CSS class or HTML element to denote this in agu.confex.com output other than the first presenter's name
+        # being encased in an html <b> tag.
+        if person['name'] not in x['firstAuthors']:
+            continue # Every time I use "continue" in a script I feel the need to shout out to @tegareacts on TikTok.
+        else:
+            talkURL = x['url']
+            talks[talkURL] = {} # creates another nested dictionary to put all info for this talk in
+            talks[talkURL]['firstAuthorName'] = person['name'] # copies the person's name from authorList to put in this nested dictionary for each talk.
+            talks[talkURL]['talkType'] = "Event"
+            talks[talkURL]['title'] = x['title']
+            talkNumber = x['talkNumber']
+            if talkNumber is None:
+                continue
+            talks[talkURL]['title'] = talks[talkURL]['title'].replace(talkNumber,"") # gets rid of talk number that is displayed in a <span> tag within the with talk title in AGU database
+            if ("T" in talkNumber):
+                talks[talkURL]['talkType'] = "Talk"
+            elif "PP" in talkNumber:
+                talks[talkURL]['talkType'] = "Poster"
+            elif "EP" in talkNumber:
+                talks[talkURL]['talkType'] = "Electronic Poster"
+            elif "U" in talkNumber:
+                talks[talkURL]['talkType'] = "Poster"
+            elif "HH" in talkNumber:
+                talks[talkURL]['talkType'] = "Talk"
+            else:
+                talks[talkURL]['talkType'] = "Presentation"
+    return talks
 
+def changedListings(oldEntries, profileEntries):
+    # Returns the set of talk URLs on a profile page whose listing is new or different from the one in the previous copy of that page
+    oldListings = {} if oldEntries is None else {x['url']: x for x in oldEntries['sessions'] + oldEntries['papers']}
+    return {x['url'] for x in profileEntries['sessions'] + profileEntries['papers'] if oldListings.get(x['url']) != x}
+
+# %%
+
+# This code block goes one level deeper into the AGU confex site by loading the page for each talk in which the person
+# is shown as lead author, and grabs the time and date for each talk
+
+# Each talk page is read into a dictionary of talkDateRaw, talkTimeRaw and talkLocation
+def loadTalkPage(talkURL): # selenium engine
+    driver = getDriver()
+    with timed("talk", "get", talkURL):
+        driver.get(talkURL)
+    with timed("talk", "wait", talkURL):
+        if waitForPage(driver, "talk", r"entryInformation", True, 300) == "timedOut": # waits until search results are actually loaded before proceeding with scraping page
+            # a talk page that hasn't shown its time after the whole 300 seconds (e.g. a withdrawn abstract) won't show it on another try either, so this isn't retried
+            raise ValueError("entryInformation never showed up")
+    return driver.page_source
+
+def buildTalkInfo(talk, talkSlot):
+    # Returns the date, time and location info. for one talk, to be merged into that talk's dictionary
+    talkInfo = {}
     try:
-        sessions = driver.find_elements_by_class_name("SessionListItem") # if person is chairing a session or workshop
-        for x in sessions:
-            talkURL = x.find_element_by_class_name("entryContent").find_element_by_tag_name("a").get_attribute("href")
-            person['talks'][talkURL] = {} # creates another nested dictionary to put all info for this talk in
-            person['talks'][talkURL]['talkType'] = "Convening Session"
-            person['talks'][talkURL]['title'] = x.find_element_by_class_name("entryContent").find_element_by_tag_name("a").text
-            person['talks'][talkURL]['firstAuthorName'] = person['name'] # copies the person's name from authorList to put in this nested dictionary for each talk.
-
-        talks = driver.find_elements_by_class_name("PaperListItem") # if it's a talk, poster, INNOVATIONS talk, etc...
-        for x in talks:
-            # check to see if person is primary author / presenting and, if so, puts talk information into dictionary for this person.
-            # There's no publicly visible flag / CSS class or HTML element to denote this in agu.confex.com output other than the first presenter's name
-            # being encased in an html <b> tag.
-            if person['name'] not in x.find_element_by_class_name("topDisplay").find_element_by_tag_name("b").text:
-                continue # Every time I use "continue" in a script I feel the need to shout out to @tegareacts on TikTok.
-            else:
-                talkURL = x.find_element_by_tag_name("a").get_attribute("href")
-                person['talks'][talkURL] = {} # creates another nested dictionary to put all info for this talk in
-                person['talks'][talkURL]['firstAuthorName'] = person['name'] # copies the person's name from authorList to put in this nested dictionary for each talk.
-                person['talks'][talkURL]['talkType'] = "Event"
-                person['talks'][talkURL]['title'] = x.find_element_by_tag_name("a").text
-                try:
-                    talkNumber = x.find_element_by_tag_name("a").find_element_by_tag_name("span").text # Workaround to get rid of paper number listed before talk title
-                    person['talks'][talkURL]['title'] = person['talks'][talkURL]['title'].replace(talkNumber,"") # gets rid of talk number that is displayed in a <span> tag within the with talk title in AGU database
-                    if ("T" in talkNumber):
-                        person['talks'][talkURL]['talkType'] = "Talk"
-                    elif "PP" in talkNumber:
-                        person['talks'][talkURL]['talkType'] = "Poster"
-                    elif "EP" in talkNumber:
-                        person['talks'][talkURL]['talkType'] = "Electronic Poster"
-                    elif "U" in talkNumber:
-                        person['talks'][talkURL]['talkType'] = "Poster"
-                    elif "HH" in talkNumber:
-                        person['talks'][talkURL]['talkType'] = "Talk"
-                    else:
-                        person['talks'][talkURL]['talkType'] = "Presentation"
-                except Exception as e:
-                    print("{} on ".format(e) + talkURL)
-    except Exception as e:
-        print("{} on ".format(e) + person['aguProfileURL'])
+        # Properly formatting the date and time into datetime objects so that they can be sorted later
+        reTime = re.search("(.+)\s-", talkSlot['talkTimeRaw'])
+        startTime = reTime.group(1)
+        rawDateTime = talkSlot['talkDateRaw'] + " " + startTime # this creates a string the formatted as, e.g., Friday, 17 December 2021 14:10
+        print(rawDateTime + " - " + talk['talkType'] + ": " + talk['title'])
 
-    # %%
+        dateTimeObj = datetime.strptime(rawDateTime, r"%A, %d %B %Y %H:%M") # This creates datetime object by reading concatenated string above
 
-    # This code block goes one level deeper into the AGU confex site by loading the page for each talk in which the person
-    # is shown as lead author, and grabs the time and date for each talk
+        talkInfo['talkDateRaw'] = talkSlot['talkDateRaw']
+        talkInfo['talkTimeRaw'] = talkSlot['talkTimeRaw']
+        talkInfo['talkLocation'] = talkSlot['talkLocation']
+        talkInfo['dateTimeObj'] = dateTimeObj
+    except Exception as e:
+        countException("talk", e)
+        print("{} on ".format(e) + talk['url'])
+    return talkInfo
 
-    for talkURL in person['talks'].keys(): # iterates through presentation urls collected above
-        try:
-            person['talks'][talkURL]['url'] = talkURL
-            driver.get(talkURL)
-            WebDriverWait(driver, 300).until(EC.visibility_of_all_elements_located((By.CLASS_NAME, r"entryInformation"))) # waits until search results are actually loaded before proceeding with scraping page
-
-            # scraping the date and time
-            talkDateRaw = driver.find_element_by_class_name("SlotDate").text
-            talkTimeRaw = driver.find_element_by_class_name("SlotTime").text
-            talkLocation = driver.find_element_by_class_name("propertyName").text
-
-            # Properly formatting the date and time into datetime objects so that they can be sorted later
-            reTime = re.search("(.+)\s-", talkTimeRaw)
-            startTime = reTime.group(1)
-            rawDateTime = talkDateRaw + " " + startTime # this creates a string the formatted as, e.g., Friday, 17 December 2021 14:10
-            print(rawDateTime + " - " + person['talks'][talkURL]['talkType'] + ": " + person['talks'][talkURL]['title'])
-
-            dateTimeObj = datetime.strptime(rawDateTime, r"%A, %d %B %Y %H:%M") # This creates datetime object by reading concatenated string above
-
-            person['talks'][talkURL]['talkDateRaw'] = talkDateRaw
-            person['talks'][talkURL]['talkTimeRaw'] = talkTimeRaw
-            person['talks'][talkURL]['talkLocation'] = talkLocation
-            person['talks'][talkURL]['dateTimeObj'] = dateTimeObj
-        except Exception as e:
-            print("{} on ".format(e) + talkURL)
 # %%
+# Run the search, profile and talk phases as one streaming pipeline
+
+# Rather than searching for everyone, then loading every profile, then loading every talk, each page is handed on to the next phase as soon as it's done.
+# A search result that matches a dept. member has their profile page queued up right away, and every talk they're first author or convener on is
+# queued up as soon as their profile page has been read. The loop below keeps up to maxInFlight pages going at once, and whenever a worker frees up it
+# is given the furthest along page that's waiting: a talk before a profile before a search. A phase therefore only gets more work once the queue after
+# it has drained, which keeps every queue short without anything ever having to block. Talks go into talkList in order of date and time as they come in,
+# so the first rows of the schedule are ready long before the last page is loaded. In batch mode the people on every job's roster go through this
+# together, and each author keeps a set of the 'jobs' they were found for.
+
+print("\n\n ----- Searching for everyone in {} in the AGU database and retrieving info. related to their talks as they're found... -----\n\n".format(", ".join(job['deptListFile'] for job in jobs)))
 
-# This code block extracts first authors from presenting list and creates list of talks being given that is sorted by presentation time
+if fetchEngine == "http":
+    startHTTPClient()
 
-talkList = [] # list of individual talks, and their dictionary objects, that are only first presenters
+searchQueue = deque() # (search URL, what the search was for)
+profileQueue = deque() # author dictionaries
+talkQueue = deque() # (talk URL, whether to refresh it)
 
-# This checks if person in authorList is based on presence of ['talks'] key / dictionary name in their dictionary object and populates the following list of talks.
-# People who aren't presenting won't have this key in the dictionary object for their name.
-# Also extracts their last name for a separate list of all authors for sort function below.
+foundOrders = {} # profile URL: earliest order the author was found in by any search, for putting authorList in the same order every run
+authorsByURL = {} # profile URL: author dictionary, so the same profile isn't loaded twice when it comes up in more than one search or more than one job
+foundPeople = set() # positions in deptPeopleList of everyone who turned up in bulk discoveryMode
+oldProfiles = {} # previous copies of the profile pages, however old, to see which talk listings changed
+talkIndex = {}
+talkList = [] # list of individual talks, and their dictionary objects, that are only first presenters. Kept sorted by dateTimeObj.
+unscheduledTalks = [] # talks whose page couldn't be loaded or read even after retrying, which still go in the schedule but without a time
+failedPages = {'search': [], 'profile': [], 'talk': []} # URLs of pages that couldn't be loaded or read even after retrying
+talkListKeys = [] # (dateTimeObj, url) of each talk in talkList, for finding where the next one goes
+
+# Every talk of every author goes into one run-wide talk index keyed by talk URL, so a session or paper that several dept. members are on is only loaded
+# once. Each entry in the index keeps a list of all of the dept. members it came from in 'deptMembers', and every person's own talks dictionary points at
+# the same entry in the index.
+
+def queueAuthor(author, foundOrder, job):
+    # Queues up the profile page of a dept. member found for job, unless it was already queued for an earlier search or another job
+    if author['aguProfileURL'] in authorsByURL:
+        authorsByURL[author['aguProfileURL']]['jobs'].add(job)
+        # whichever search finished first got here first, so the order is kept from the earliest search rather than the fastest one
+        foundOrders[author['aguProfileURL']] = min(foundOrders[author['aguProfileURL']], foundOrder)
+        return
+    author['jobs'] = {job}
+    authorsByURL[author['aguProfileURL']] = author
+    foundOrders[author['aguProfileURL']] = foundOrder
+    print("\n\nRetrieving primary author submissions for " + author['name'] + "\n")
+    profileQueue.append(author)
+
+if discoveryMode == "bulk":
+    # Rather than one search per person, every term in discoverySearchTerms is searched once and all of its pages of results are gone through. The next
+    # page of a term is only queued once the one before it has come back with results on it, and a term stops at the first page that comes back empty.
+    # Stopping at a short page instead would stop early if the website hands back fewer than searchPageSize results a page. Jobs at the same meeting
+    # that share a search term only search for it once.
+    discoverySearches = [] # (meeting URL, search term)
+    for job in jobs:
+        for searchTerm in job['discoverySearchTerms']:
+            if (job['meetingURL'], searchTerm) not in discoverySearches:
+                discoverySearches.append((job['meetingURL'], searchTerm))
+    termCounts = [0] * len(discoverySearches)
+    def queueSearchPage(t, pageNumber):
+        if pageNumber <= discoveryMaxPages:
+            searchQueue.append((searchURL(discoverySearches[t][0], discoverySearches[t][1], pageNumber), (t, pageNumber)))
+    for t in range(len(discoverySearches)):
+        queueSearchPage(t, 1)
+else:
+    searchesFor = {} # search URL: positions in deptPeopleList of everyone it's for, so someone who's on more than one job's roster is only searched for once
+    for i, person in enumerate(deptPeopleList): # list but querying key/value pairs as if it were a dictionary
+        person['searchURL'] = searchURL(jobs[person['job']]['meetingURL'], person['firstName'] + " " + person['lastName'], 1) # Concatenates first name and last name persons in file to ignore middle initial, which may cause problems in search URL
+        if person['searchURL'] not in searchesFor:
+            searchesFor[person['searchURL']] = []
+            searchQueue.append((person['searchURL'], searchesFor[person['searchURL']]))
+        searchesFor[person['searchURL']].append(i)
+
+def searchDone(searchFor, searchResults):
+    if searchResults is None:
+        return
+    if discoveryMode == "bulk":
+        t, pageNumber = searchFor
+        termCounts[t] = termCounts[t] + len(searchResults)
+        if len(searchResults) > 0: # there may be more on the next page
+            queueSearchPage(t, pageNumber + 1)
+        for r, result in enumerate(searchResults):
+            # everyone it could be who is on a job at the meeting that was searched and whose affiliation patterns it matches
+            matched = [i for i in matchPeople(result['name']) if jobs[deptPeopleList[i]['job']]['meetingURL'] == discoverySearches[t][0]
+                       and jobs[deptPeopleList[i]['job']]['affiliationRegex'].search(result['affiliation'])]
+            if len(matched) > 0:
+                foundPeople.update(matched)
+                author = authorsByURL.get(result['aguProfileURL']) or authorDictionary(result) # same person will come up under more than one search term
+                for job in sorted(set(deptPeopleList[i]['job'] for i in matched)):
+                    queueAuthor(author, (t, pageNumber, r), job)
+    else:
+        for i in searchFor:
+            for r, author in enumerate(matchSearchResults(i, searchResults)):
+                queueAuthor(author, (i, r), deptPeopleList[i]['job'])
+
+def profileDone(person, profileEntries):
+    person['talks'] = {} # nested dictionary for talks for each person
+    if profileEntries is None:
+        return
+    changed = changedListings(oldProfiles.pop(person['aguProfileURL'], None), profileEntries)
+    for talkURL, talk in buildTalks(person, profileEntries).items():
+        if talkURL not in talkIndex:
+            talkIndex[talkURL] = talk
+            talkIndex[talkURL]['url'] = talkURL
+            talkIndex[talkURL]['deptMembers'] = []
+            talkQueue.append((talkURL, (talkURL in changed) if refreshChangedTalksOnly else None))
+        if person['name'] not in talkIndex[talkURL]['deptMembers']: # same person can turn up more than once under different profile URLs
+            talkIndex[talkURL]['deptMembers'].append(person['name'])
+        person['talks'][talkURL] = talkIndex[talkURL]
+
+def talkDone(talkURL, talkSlot):
+    talk = talkIndex[talkURL]
+    if talkSlot is not None:
+        talk.update(buildTalkInfo(talk, talkSlot))
+    if 'dateTimeObj' in talk:
+        key = (talk['dateTimeObj'], talkURL)
+        position = bisect.bisect(talkListKeys, key) # sorted insert, so talkList is always in schedule order
+        talkListKeys.insert(position, key)
+        talkList.insert(position, talk)
+    else:
+        unscheduledTalks.append(talk)
+
+pipelineStarted = time.perf_counter()
+inFlight = {} # Future for each page being fetched: (phase, what it's for)
+while True:
+    while len(inFlight) < int(concurrencyLimit): # set by the concurrency controller in the page fetching section
+        if len(talkQueue) > 0:
+            talkURL, refresh = talkQueue.popleft()
+            inFlight[submitPage("talk", talkURL, loadTalkPage, parseTalkSlot, refresh)] = ("talk", talkURL, talkURL)
+        elif len(profileQueue) > 0:
+            person = profileQueue.popleft()
+            if refreshChangedTalksOnly:
+                oldProfiles[person['aguProfileURL']] = cacheGet(person['aguProfileURL'])
+            inFlight[submitPage("profile", person['aguProfileURL'], loadProfilePage, parseProfileEntries)] = ("profile", person, person['aguProfileURL'])
+        elif len(searchQueue) > 0:
+            url, searchFor = searchQueue.popleft()
+            inFlight[submitPage("search", url, loadSearchPage, parseSearchResults)] = ("search", searchFor, url)
+        else:
+            break
+    if len(inFlight) == 0:
+        break # nothing waiting and nothing being fetched, so we're done
+    done, stillGoing = wait(inFlight, return_when=FIRST_COMPLETED)
+    for future in done:
+        phase, item, url = inFlight.pop(future)
+        if future.result() is None:
+            failedPages[phase].append(url)
+        if phase == "search":
+            searchDone(item, future.result())
+        elif phase == "profile":
+            profileDone(item, future.result())
+        else:
+            talkDone(item, future.result())
+
+recordTime("pipeline", "run", time.perf_counter() - pipelineStarted)
+
+if discoveryMode == "bulk":
+    for t, (searchMeetingURL, searchTerm) in enumerate(discoverySearches):
+        print("\n{} people found searching {} for {}".format(termCounts[t], searchMeetingURL, searchTerm))
+    for i, person in enumerate(deptPeopleList):
+        if i not in foundPeople:
+            print("\n" + person['fullName'] + " doesn't appear to be an author on anything happening at AGU this year")
+
+# Things came in in whatever order the pages finished, so this puts authorList and the dept. members on each talk in the same order every run
+authorList = sorted(authorsByURL.values(), key=lambda author: foundOrders[author['aguProfileURL']])
+authorRank = {}
+for rank, author in enumerate(authorList):
+    authorRank.setdefault(author['name'], rank)
+for talk in talkIndex.values():
+    talk['deptMembers'].sort(key=lambda name: authorRank[name])
+
+print("\n{} talks in the talk index for {} dept. members".format(len(talkIndex), len(authorList)))
+for phase, counts in phaseCounts.items():
+    print("{} pages: {} fetched, {} taken from the page cache, {} already done in the checkpoint store".format(phase, counts['fetched'], counts['cached'], counts['resumed']))
+for phase, urls in failedPages.items():
+    if len(urls) > 0:
+        print("\n-----* {} {} pages couldn't be loaded or read even after retrying:".format(len(urls), phase))
+        for url in sorted(urls):
+            print(url)
+if checkpointFile and any(len(urls) > 0 for urls in failedPages.values()):
+    print("\nRun the script again with --resume to try just the pages that failed again.")
+if len(unscheduledTalks) > 0:
+    print("\n{} talks have no time, and are listed at the end of the schedule".format(len(unscheduledTalks)))
+cacheEvict()
+
+if fetchEngine == "http":
+    stopHTTPClient()
+browserPool.shutdown()
+if parsePool is not None:
+    parsePool.shutdown()
+for driver in browserList: # all done with the browsers at this point
+    driver.quit()
+
+# %%
+
+# This code block gets authorList ready for the list of all dept. authors at the end of the HTML. The list of talks being given, sorted by presentation time, was already built as talks came in above.
+
+# Extracts last name of everyone in authorList for a separate list of all authors for sort function below.
 
 for person in authorList:
     person['lastName'] = re.search("[\w-]+$", person['name']).group() # uses regex to extract their last name and put it in a last name field in the dictionrary object for the person
-    if "talks" in person:
-        for talk in person['talks'].keys():
-            talkList.append(person['talks'][talk])
-    else:
-        pass
 
 deptPresenterList = []
 for x in deptPeopleList:
@@ -265,11 +1120,7 @@ for x in deptPeopleList:
 
 # %%
 
-# Sorting the presenters list by the datetime object so when we write everything out to HTML below, it's all already sorted
-
-def sortFunc(t): # defining object for use in sort() that only returns value in dictionary key to sort against
-    return t['dateTimeObj']
-talkList.sort(key=sortFunc)
+# The presenters list is already sorted by the datetime object, since talks were put into talkList in order as they came in, so when we write everything out to HTML below, it's all already sorted
 
 # Sorting authorList by last name
 def lastNameSort(e): # for sorting
@@ -280,49 +1131,113 @@ authorList.sort(key=lastNameSort)
 #%%
 # This code block writes out the HTML to teh output file designated in the parameters section at the beginning of the script.
 
-with open(outputScheduleHTML,'a',encoding='utf-8') as outfile:
+htmlStarted = time.perf_counter()
+# Each job gets its own schedule, with only the talks and authors of the people on its roster
+for j, job in enumerate(jobs):
+    jobAuthors = [author for author in authorList if j in author['jobs']]
+    jobNames = {author['name'] for author in jobAuthors}
+    jobTalkURLs = {talkURL for author in jobAuthors for talkURL in author.get('talks', {})}
 
-    # iterators used for logic below as to where to insert a day header into the HTML schedule
-    day = ""
-    lastTalkFormat = ""
+    with open(job['outputScheduleHTML'],'a',encoding='utf-8') as outfile:
 
-    # Introductory text for HTML file
-    outfile.write(r"<p>U-Mass Geosciences has a strong showing at annual Fall meeting of the <a href=\"https://www.agu.org/Fall-Meeting\">American Geophysical Union</a>. If you're attending #AGU21 in New Orleans this year, either virtually or in person, don't miss out! Here is a schedule of who is presenting and when:</p>")
-    outfile.write("<p>Only the first author is listed for each presentation below. All times listed are in {}. Be sure to click through to the talk for more information.".format(timezone))
-    outfile.write(r"Click <a href=\"#section2\">here</a> for a list of all department members who are co-authors on this year's AGU talks!")
-    outfile.write("<table>")
+        # iterators used for logic below as to where to insert a day header into the HTML schedule
+        day = ""
+        lastTalkFormat = ""
 
-    # Writing out the talk schedule as an HTML table
-    for x in talkList:
+        # Introductory text for HTML file
+        outfile.write(r"<p>U-Mass Geosciences has a strong showing at annual Fall meeting of the <a href=\"https://www.agu.org/Fall-Meeting\">American Geophysical Union</a>. If you're attending #AGU21 in New Orleans this year, either virtually or in person, don't miss out! Here is a schedule of who is presenting and when:</p>")
+        outfile.write("<p>Only the first author is listed for each presentation below. All times listed are in {}. Be sure to click through to the talk for more information.".format(timezone))
+        outfile.write(r"Click <a href=\"#section2\">here</a> for a list of all department members who are co-authors on this year's AGU talks!")
+        outfile.write("<table>")
 
-        # Logic to divide up the table by day and make a header for it
-        currentDay = datetime.strftime(x['dateTimeObj'], r"%A, %d %B %Y")
-        if currentDay != day:
-            outfile.write("<tr><td><h1>{}</h1></td></tr>".format(currentDay))
-            day = currentDay
-        else:
-            day = currentDay
-
-        authors = x['firstAuthorName']
-
-        # logic to replace any weird characters in author names that may appear due to UTF-8 encoding issues
-        fixedAuthors = authors.replace("Ã±", "ñ").replace("Â", "").replace("Ã§", "ç") # fixing weird encoding issues
-        title = x['title']
-        fixedTitle = title.replace("â", "-").replace("Ë", "˚").replace("\n", "").replace("\t", "").replace("\r", "").replace("Ã", "í")
-        url = x['url']
-
-        outfile.write("<tr><td>")
-        outfile.write("<strong>" + fixedAuthors + "</strong><br>")
-        outfile.write("<em>{}</em>".format(x['talkDateRaw'] + " - " + x['talkTimeRaw'] + " " + timezone))
-        outfile.write("<br><em>" + x['talkType'] + ":</em>  <a href=\"{}\" target=\"_blank\">{}</a><br>".format(url, fixedTitle))
-        outfile.write("</td></tr>")
-    outfile.write("</table>")
-    outfile.write("<h1 id=\"section2\">List of all department AGU authors</h1>")
-    outfile.write("<ul>")
-
-    # Write out list of all the authors of AGU talks in the department.
-    for x in authorList:
-        outfile.write("<li><a href=\"" + x['aguProfileURL'] + "\">" + x['name'] + "</a></li>")
-    outfile.write("</ul>")
-
-print("\n ----* Schedule of department presenters written to {}".format(outputScheduleHTML))
+        # Writing out the talk schedule as an HTML table
+        for x in talkList + sorted(unscheduledTalks, key=lambda talk: talk['url']): # talks whose time couldn't be gotten go at the end rather than being left out
+            if x['url'] not in jobTalkURLs:
+                continue
+
+            # Logic to divide up the table by day and make a header for it
+            if 'dateTimeObj' in x:
+                currentDay = datetime.strftime(x['dateTimeObj'], r"%A, %d %B %Y")
+                when = x['talkDateRaw'] + " - " + x['talkTimeRaw'] + " " + timezone
+            else:
+                currentDay = "Time not available"
+                when = "See the talk page for the time"
+            if currentDay != day:
+                outfile.write("<tr><td><h1>{}</h1></td></tr>".format(currentDay))
+                day = currentDay
+            else:
+                day = currentDay
+
+            authors = ", ".join(name for name in x['deptMembers'] if name in jobNames) # every dept. member on this job who is first author or convener on this talk
+
+            # logic to replace any weird characters in author names that may appear due to UTF-8 encoding issues
+            fixedAuthors = authors.replace("Ã±", "ñ").replace("Â", "").replace("Ã§", "ç") # fixing weird encoding issues
+            title = x['title']
+            fixedTitle = title.replace("â", "-").replace("Ë", "˚").replace("\n", "").replace("\t", "").replace("\r", "").replace("Ã", "í")
+            url = x['url']
+
+            outfile.write("<tr><td>")
+            outfile.write("<strong>" + fixedAuthors + "</strong><br>")
+            outfile.write("<em>{}</em>".format(when))
+            outfile.write("<br><em>" + x['talkType'] + ":</em>  <a href=\"{}\" target=\"_blank\">{}</a><br>".format(url, fixedTitle))
+            outfile.write("</td></tr>")
+        outfile.write("</table>")
+        outfile.write("<h1 id=\"section2\">List of all department AGU authors</h1>")
+        outfile.write("<ul>")
+
+        # Write out list of all the authors of AGU talks in the department.
+        for x in jobAuthors:
+            outfile.write("<li><a href=\"" + x['aguProfileURL'] + "\">" + x['name'] + "</a></li>")
+        outfile.write("</ul>")
+
+    print("\n ----* Schedule of department presenters written to {}".format(job['outputScheduleHTML']))
+
+recordTime("output", "write", time.perf_counter() - htmlStarted)
+
+# %%
+# Where the time went
+
+latencyBuckets = [0.1, 0.25, 0.5, 1, 2, 5, 10, 30, 60, 120, 300] # upper edges, in seconds, of the bins in the per-page latency histograms
+
+def percentile(values, q):
+    values = sorted(values)
+    return values[int(q * (len(values) - 1))] if len(values) > 0 else 0
+
+def latencyHistogram(latencies):
+    labels = ["<={}s".format(edge) for edge in latencyBuckets] + [">{}s".format(latencyBuckets[-1])]
+    histogram = {label: 0 for label in labels}
+    for seconds in latencies:
+        histogram[labels[bisect.bisect_left(latencyBuckets, seconds)]] += 1
+    return histogram
+
+runProfile = {'started': datetime.fromtimestamp(runStarted).isoformat(), 'wallSeconds': time.time() - runStarted, 'fetchEngine': fetchEngine,
+              'concurrencyLimit': concurrencyLimit, 'failedPages': failedPages, 'phases': {}}
+for phase in ['browser', 'search', 'profile', 'talk', 'pipeline', 'output']:
+    pages = {url: steps for (pagePhase, url), steps in pageTimes.items() if pagePhase == phase}
+    latencies = [sum(steps.values()) for steps in pages.values()] # everything spent on a page: loading it, waiting on it, waiting to retry it and parsing it
+    runProfile['phases'][phase] = {
+        'stepTotals': {step: sum(times) for step, times in stepTimes.get(phase, {}).items()},
+        'stepCounts': {step: len(times) for step, times in stepTimes.get(phase, {}).items()},
+        'exceptions': exceptionCounts.get(phase, {}),
+        'pages': len(pages),
+        'pageSources': phaseCounts.get(phase, {}),
+        'latency': {'median': percentile(latencies, 0.5), 'p95': percentile(latencies, 0.95), 'max': max(latencies) if latencies else 0},
+        'latencyHistogram': latencyHistogram(latencies),
+        'pageLatencies': {url: steps for url, steps in pages.items()},
+    }
+
+print("\n ----- Run profile ({:.1f} seconds in all) -----\n".format(runProfile['wallSeconds']))
+print("{:<10}{:>7}{:>10}{:>9}{:>8}{:>10}{:>10}{:>10}{:>9}{:>9}{:>9}".format("phase", "pages", "errors", "retries", "failed", "get s", "wait s", "parse s", "median", "p95", "max"))
+for phase in ['search', 'profile', 'talk']:
+    report = runProfile['phases'][phase]
+    totals = report['stepTotals']
+    print("{:<10}{:>7}{:>10}{:>9}{:>8}{:>10.1f}{:>10.1f}{:>10.1f}{:>9.2f}{:>9.2f}{:>9.2f}".format(phase, report['pages'], sum(report['exceptions'].values()),
+        report['stepCounts'].get('backoff', 0), len(failedPages[phase]), totals.get('get', 0), totals.get('wait', 0), totals.get('parse', 0),
+        report['latency']['median'], report['latency']['p95'], report['latency']['max']))
+print("\nbrowser startup: {:.1f}s, pipeline: {:.1f}s, writing HTML: {:.1f}s".format(runProfile['phases']['browser']['stepTotals'].get('startup', 0),
+    runProfile['phases']['pipeline']['stepTotals'].get('run', 0), runProfile['phases']['output']['stepTotals'].get('write', 0)))
+
+if runProfileFile:
+    with open(runProfileFile, 'w') as profileOutput:
+        json.dump(runProfile, profileOutput, indent=2)
+    print("\n ----* Run profile written to {}".format(runProfileFile))
@@ -0,0 +1,147 @@
+# Benchmark 2021_AGU_Scrape.py against synthetic meetings of growing size served by standin_server.py
+#
+# For each scale (people x sessions) this starts a stand-in meeting website, writes a roster of its department members, runs the whole scraper
+# against it with --config and reports the wall time, pages per second and peak memory of the run, e.g.
+#     python run_benchmark.py --scales 100x40 400x160 1600x640 --engine http
+# Peak memory is the most the scraper and everything it started (geckodriver and all of the Firefox processes) had resident at once between them. It is
+# read with ps while the run is going, so it's only shown on Linux or a Mac and can miss a spike shorter than memorySampleSeconds.
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+from standin_server import addMeetingArguments, meetingFromArguments, serve
+
+scriptPath = os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir, "2021_AGU_Scrape.py")
+
+memorySampleSeconds = 0.25
+
+def treeMemoryKB(rootPID):
+    # Adds up the resident size of a process and every process under it, or None if ps isn't there to ask
+    try:
+        listing = subprocess.run(["ps", "-A", "-o", "pid=,ppid=,rss="], stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, text=True).stdout
+    except OSError:
+        return None
+    children = {}
+    rss = {}
+    for line in listing.splitlines():
+        fields = line.split()
+        if len(fields) == 3 and all(field.isdigit() for field in fields):
+            pid, ppid, kb = (int(field) for field in fields)
+            children.setdefault(ppid, []).append(pid)
+            rss[pid] = kb
+    if rootPID not in rss:
+        return None
+    total = 0
+    stack = [rootPID]
+    while len(stack) > 0:
+        pid = stack.pop()
+        total = total + rss.get(pid, 0)
+        stack.extend(children.get(pid, []))
+    return total
+
+def runMeasured(command, workDir):
+    # Runs command and samples the memory of its whole process tree until it finishes. Gives back (return code, output, peak KB or None).
+    process = subprocess.Popen(command, cwd=workDir, stdout=subprocess.PIPE, stderr=subprocess.STDOUT, text=True)
+    samples = []
+    def sample():
+        while process.poll() is None:
+            kb = treeMemoryKB(process.pid)
+            if kb is not None:
+                samples.append(kb)
+            time.sleep(memorySampleSeconds)
+    sampler = threading.Thread(target=sample, daemon=True)
+    sampler.start()
+    output = process.communicate()[0]
+    sampler.join()
+    return process.returncode, output, max(samples) if len(samples) > 0 else None
+
+def runScale(args, people, sessions, workDir):
+    meeting = meetingFromArguments(args, people, sessions)
+    server, meetingURL = serve(meeting)
+    name = "{}x{}".format(people, sessions)
+    rosterFile = os.path.join(workDir, name + "_roster.csv")
+    profileFile = os.path.join(workDir, name + "_profile.json")
+    configFile = os.path.join(workDir, name + "_config.json")
+    meeting.writeRoster(rosterFile)
+    config = {
+        'deptListFile': rosterFile,
+        'outputScheduleHTML': os.path.join(workDir, name + "_schedule.html"),
+        'meetingURL': meetingURL,
+        'fetchEngine': args.engine,
+        'discoveryMode': args.discovery,
+        'discoverySearchTerms': ["Massachusetts"],
+        'affiliationPatternsFile': "",
+        'runProfileFile': profileFile,
+        'pageCacheFile': "",
+        'checkpointFile': "",
+    }
+    if args.geckodriver:
+        config['geckoPath'] = args.geckodriver
+    if args.workers:
+        config['numBrowsers'] = args.workers
+        config['httpConcurrency'] = args.workers
+    if args.lean:
+        config['leanBrowsing'] = True
+    config['requestsPerSecond'] = args.rate
+    config['leanEmptyClasses'] = [args.empty_marker] if args.empty_marker else []
+    with open(configFile, 'w') as f:
+        json.dump(config, f)
+
+    started = time.time()
+    returnCode, output, peakKB = runMeasured([sys.executable, scriptPath, "--config", configFile], workDir)
+    wallSeconds = time.time() - started
+    server.shutdown()
+
+    result = {'scale': name, 'people': people, 'sessions': sessions, 'deptMembers': len(meeting.roster()), 'wallSeconds': wallSeconds}
+    if returnCode != 0 or not os.path.exists(profileFile):
+        print(output[-3000:])
+        return result
+    result['peakMB'] = peakKB / 1024 if peakKB is not None else None # ps gives kilobytes on both Linux and a Mac
+    with open(profileFile) as f:
+        profile = json.load(f)
+    result['pages'] = {phase: profile['phases'][phase]['pageSources'].get('fetched', 0) for phase in ['search', 'profile', 'talk']}
+    result['pagesPerSecond'] = sum(result['pages'].values()) / wallSeconds
+    result['exceptions'] = sum(sum(profile['phases'][phase]['exceptions'].values()) for phase in ['search', 'profile', 'talk'])
+    result['retries'] = sum(profile['phases'][phase]['stepCounts'].get('backoff', 0) for phase in ['search', 'profile', 'talk'])
+    result['failed'] = sum(len(urls) for urls in profile['failedPages'].values())
+    return result
+
+if __name__ == "__main__":
+    argParser = argparse.ArgumentParser(description="Benchmark 2021_AGU_Scrape.py against synthetic meetings served locally")
+    argParser.add_argument("--scales", nargs="+", default=["100x40", "400x160", "1600x640"], help="meeting sizes to run, as people x sessions")
+    argParser.add_argument("--engine", default="http", choices=["http", "selenium"])
+    argParser.add_argument("--discovery", default="perPerson", choices=["perPerson", "bulk"])
+    argParser.add_argument("--workers", type=int, default=0, help="numBrowsers / httpConcurrency for the scraper, leave at 0 for the script's own default")
+    argParser.add_argument("--rate", type=float, default=0, help="requestsPerSecond for the scraper. 0 (no limit) measures how fast it can go")
+    argParser.add_argument("--lean", action="store_true", help="turn on leanBrowsing for the selenium engine")
+    argParser.add_argument("--geckodriver", default="", help="path to geckodriver for the selenium engine")
+    argParser.add_argument("--output", default="", help="JSON file to write the results to")
+    addMeetingArguments(argParser)
+    args = argParser.parse_args()
+
+    results = []
+    with tempfile.TemporaryDirectory() as workDir:
+        for scale in args.scales:
+            people, sessions = (int(n) for n in scale.lower().split("x"))
+            print(" ----* Running {} people x {} sessions".format(people, sessions))
+            results.append(runScale(args, people, sessions, workDir))
+
+    print("\n{:<14}{:>8}{:>9}{:>9}{:>9}{:>8}{:>9}{:>8}{:>10}{:>10}{:>10}".format("scale", "dept", "search", "profile", "talk", "errors", "retries", "failed",
+        "wall s", "pages/s", "peak MB"))
+    for result in results:
+        if 'pages' not in result:
+            print("{:<14}{:>8}   run failed after {:.1f}s, see output above".format(result['scale'], result['deptMembers'], result['wallSeconds']))
+            continue
+        print("{:<14}{:>8}{:>9}{:>9}{:>9}{:>8}{:>9}{:>8}{:>10.1f}{:>10.1f}{:>10}".format(result['scale'], result['deptMembers'], result['pages']['search'],
+            result['pages']['profile'], result['pages']['talk'], result['exceptions'], result['retries'], result['failed'], result['wallSeconds'],
+            result['pagesPerSecond'], "{:.0f}".format(result['peakMB']) if result['peakMB'] is not None else "n/a"))
+
+    if args.output:
+        with open(args.output, 'w') as outputFile:
+            json.dump(results, outputFile, indent=2)
@@ -0,0 +1,214 @@
+# Local stand-in for the agu.confex.com meeting website, for benchmarking 2021_AGU_Scrape.py without hitting the real site
+#
+# Generates a synthetic meeting (people, sessions and papers) and serves the same markup the scraper reads off the real meetingapp.cgi pages:
+# PersonListItem search results, SessionListItem / PaperListItem profile entries with the first presenter in a <b> tag in topDisplay, and
+# SlotDate / SlotTime / propertyName on each session or paper page. Some pages can be made slow, empty or fail on purpose to see how the scraper copes.
+#
+# Run it on its own with e.g.
+#     python standin_server.py --people 200 --sessions 80 --roster roster.csv
+# and point meetingURL in the scraper at the URL it prints, or let run_benchmark.py start it for you.
+
+import argparse
+import csv
+import random
+import threading
+import time
+from datetime import datetime, timedelta
+from html import escape
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+firstNames = ["Ana", "Ben", "Chloe", "Dev", "Elena", "Farid", "Grace", "Hiro", "Ines", "Jonas", "Kavya", "Liam", "Maya", "Nadia", "Omar", "Priya",
+              "Quinn", "Rosa", "Sam", "Tariq", "Uma", "Victor", "Wen", "Ximena", "Yusuf", "Zoe"]
+lastNames = ["Abbott", "Baker", "Castro", "Dubois", "Eriksen", "Fischer", "Garcia", "Haddad", "Ibarra", "Jensen", "Kowalski", "Lindqvist", "Moreau",
+             "Nakamura", "Okafor", "Petrov", "Quispe", "Rossi", "Silva", "Tanaka", "Ueda", "Varga", "Weber", "Xu", "Yilmaz", "Zhang"]
+deptAffiliation = "University of Massachusetts Amherst"
+otherAffiliations = ["Oregon State University", "University of Colorado Boulder", "Lamont-Doherty Earth Observatory", "University of Bristol"]
+talkTypes = ["T", "PP", "EP", "U", "HH", "INNOVATIONS"] # first part of the paper numbers, which the scraper turns into talk types
+
+def letters(n):
+    # 0 -> "", 1 -> "a", 27 -> "aa", ... so every generated name is unique but still only made of letters, like a real one
+    suffix = ""
+    while n > 0:
+        n, r = divmod(n - 1, 26)
+        suffix = chr(ord("a") + r) + suffix
+    return suffix
+
+class SyntheticMeeting:
+    def __init__(self, people=200, sessions=80, papersPerSession=6, coauthors=3, deptFraction=0.25, slowFraction=0.0, slowSeconds=2.0,
+                 emptyFraction=0.0, emptyMarker="", errorFraction=0.0, seed=2021):
+        rng = random.Random(seed)
+        self.people = []
+        for i in range(people):
+            self.people.append({
+                'id': i + 1,
+                'firstName': firstNames[i % len(firstNames)],
+                'lastName': lastNames[(i // len(firstNames)) % len(lastNames)] + letters(i // (len(firstNames) * len(lastNames))),
+                'affiliation': deptAffiliation if rng.random() < deptFraction else rng.choice(otherAffiliations),
+                'entries': [],
+            })
+        self.entries = {} # "Session/<id>" or "Paper/<id>": dictionary for that page
+        start = datetime(2021, 12, 13, 8, 0)
+        paperID = 1
+        for s in range(sessions):
+            sessionStart = start + timedelta(days=s % 5, hours=2 * ((s // 5) % 5))
+            conveners = rng.sample(self.people, min(len(self.people), rng.randint(1, 2)))
+            session = {'key': "Session/{}".format(s + 1), 'title': "Synthetic Session {}".format(s + 1), 'start': sessionStart,
+                       'minutes': 120, 'room': "Room {}".format(100 + s % 30), 'people': conveners}
+            self.entries[session['key']] = session
+            for person in conveners:
+                person['entries'].append(session)
+            talkType = rng.choice(talkTypes)
+            for p in range(papersPerSession):
+                authors = rng.sample(self.people, min(len(self.people), 1 + rng.randint(0, 2 * coauthors))) # first author is the presenter
+                paper = {'key': "Paper/{}".format(paperID), 'title': "Synthetic paper {}".format(paperID), 'start': sessionStart + timedelta(minutes=10 * p),
+                         'minutes': 10, 'room': session['room'], 'people': authors, 'number': "{}{}A-{:02d}".format(talkType, s + 1, p + 1)}
+                self.entries[paper['key']] = paper
+                for person in authors:
+                    person['entries'].append(paper)
+                paperID = paperID + 1
+        self.slowPages = set(key for key in self.pageKeys() if rng.random() < slowFraction)
+        self.emptyPages = set("Person/{}".format(person['id']) for person in self.people if rng.random() < emptyFraction)
+        self.errorPages = set(key for key in self.pageKeys() if rng.random() < errorFraction) # these fail with a 503 the first time they're asked for
+        self.emptyMarker = emptyMarker # class of the element an empty profile page shows, if any. The real website's isn't known, so by default there's none.
+        self.slowSeconds = slowSeconds
+        self.lock = threading.Lock()
+
+    def pageKeys(self):
+        return ["Person/{}".format(person['id']) for person in self.people] + list(self.entries.keys())
+
+    def roster(self):
+        # rows for the scraper's deptListFile: everyone at deptAffiliation
+        return [{'fullName': person['firstName'] + " " + person['lastName'], 'firstName': person['firstName'], 'firstInitial': person['firstName'][0],
+                 'lastName': person['lastName']} for person in self.people if person['affiliation'] == deptAffiliation]
+
+    def writeRoster(self, path):
+        with open(path, "w", newline="") as rosterFile:
+            writer = csv.DictWriter(rosterFile, fieldnames=["fullName", "firstName", "firstInitial", "lastName"])
+            writer.writeheader()
+            writer.writerows(self.roster())
+
+    def searchPage(self, base, query):
+        words = query.get('searchterm', [""])[0].lower().split()
+        size = int(query.get('size', ["10"])[0])
+        page = int(query.get('page', ["1"])[0])
+        hits = [person for person in self.people
+                if all(word in (person['firstName'] + " " + person['lastName'] + " " + person['affiliation']).lower() for word in words)]
+        body = ['<div class="searchResults">']
+        for person in hits[(page - 1) * size:page * size]:
+            body.append('<div class="PersonListItem Person"><div class="name"><a href="{}/Person/{}">{} {}</a></div><div class="affiliation">{}</div></div>'.format(
+                base, person['id'], escape(person['firstName']), escape(person['lastName']), escape(person['affiliation'])))
+        body.append('</div>')
+        return "".join(body)
+
+    def profilePage(self, base, key):
+        person = self.people[int(key.split("/")[1]) - 1]
+        body = ['<div class="personDetail"><h2>{} {}</h2></div>'.format(escape(person['firstName']), escape(person['lastName']))]
+        if key in self.emptyPages or len(person['entries']) == 0:
+            if self.emptyMarker:
+                body.append('<div class="{}">No presentations</div>'.format(escape(self.emptyMarker)))
+            return "".join(body)
+        body.append('<div class="field_ParentList_Entry">')
+        for entry in person['entries']:
+            if entry['key'].startswith("Session"):
+                body.append('<div class="SessionListItem WORKSHOPS    "><div class="entryContent"><a href="{}/{}">{}</a></div></div>'.format(base, entry['key'], escape(entry['title'])))
+            else:
+                names = ["{} {}".format(p['firstName'], p['lastName']) for p in entry['people']]
+                authors = "<b>{}</b>".format(escape(names[0])) + "".join(", " + escape(name) for name in names[1:])
+                body.append('<div class="PaperListItem {}"><div class="topDisplay">{}</div><div class="entryContent"><a href="{}/{}"><span>{}</span> {}</a></div></div>'.format(
+                    entry['number'].split("A-")[0].rstrip("0123456789"), authors, base, entry['key'], escape(entry['number']), escape(entry['title'])))
+        body.append('</div>')
+        return "".join(body)
+
+    def entryPage(self, key):
+        entry = self.entries[key]
+        end = entry['start'] + timedelta(minutes=entry['minutes'])
+        return ('<div class="entryInformation"><div class="SlotDate">{}</div><div class="SlotTime">{} - {}</div><div class="propertyName">{}</div></div>'.format(
+            entry['start'].strftime("%A, %d %B %Y"), entry['start'].strftime("%H:%M"), end.strftime("%H:%M"), escape(entry['room'])))
+
+    def failsNow(self, path):
+        # Whether a request to path should get a 503 this time, which is only the first time for each of errorPages
+        key = path.split("/meetingapp.cgi/", 1)[-1]
+        with self.lock:
+            if key in self.errorPages:
+                self.errorPages.discard(key)
+                return True
+        return False
+
+    def render(self, path, query):
+        # Returns the html for a request to path, or None if there's no such page
+        if "/meetingapp.cgi/" not in path:
+            return None
+        base, key = path.split("/meetingapp.cgi/", 1)
+        base = base + "/meetingapp.cgi"
+        if key in self.slowPages:
+            time.sleep(self.slowSeconds)
+        if key.startswith("Search/"):
+            return self.searchPage(base, query)
+        if key.startswith("Person/") and 0 < int(key.split("/")[1]) <= len(self.people):
+            return self.profilePage(base, key)
+        if key in self.entries:
+            return self.entryPage(key)
+        return None
+
+def serve(meeting, port=0):
+    # Starts serving meeting in a background thread and returns (server, meetingURL)
+    class Handler(BaseHTTPRequestHandler):
+        def log_message(self, *args):
+            pass
+        def do_GET(self):
+            url = urlparse(self.path)
+            if meeting.failsNow(url.path):
+                self.send_error(503)
+                return
+            html = meeting.render(url.path, parse_qs(url.query))
+            if html is None:
+                self.send_error(404)
+                return
+            body = ("<html><body>" + html + "</body></html>").encode("utf-8")
+            self.send_response(200)
+            self.send_header("Content-Type", "text/html; charset=utf-8")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+    server = ThreadingHTTPServer(("127.0.0.1", port), Handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, "http://127.0.0.1:{}/agu/fm21/meetingapp.cgi".format(server.server_address[1])
+
+def addMeetingArguments(argParser):
+    argParser.add_argument("--papers-per-session", type=int, default=6)
+    argParser.add_argument("--coauthors", type=int, default=3, help="average number of co-authors on each paper, which sets how often dept. members share talks")
+    argParser.add_argument("--dept-fraction", type=float, default=0.25, help="fraction of everyone in the meeting that is in the department")
+    argParser.add_argument("--slow-fraction", type=float, default=0.0, help="fraction of pages that are slow to respond")
+    argParser.add_argument("--slow-seconds", type=float, default=2.0, help="how long a slow page takes")
+    argParser.add_argument("--empty-fraction", type=float, default=0.0, help="fraction of profile pages that come back with nothing on them")
+    argParser.add_argument("--empty-marker", default="", help="CSS class of the element an empty profile page shows. Without one, the scraper can't tell an empty profile from a broken page and counts it as failed")
+    argParser.add_argument("--error-fraction", type=float, default=0.0, help="fraction of pages that fail with a 503 the first time they're asked for")
+    argParser.add_argument("--seed", type=int, default=2021)
+
+def meetingFromArguments(args, people, sessions):
+    return SyntheticMeeting(people=people, sessions=sessions, papersPerSession=args.papers_per_session, coauthors=args.coauthors,
+                            deptFraction=args.dept_fraction, slowFraction=args.slow_fraction, slowSeconds=args.slow_seconds,
+                            emptyFraction=args.empty_fraction, emptyMarker=args.empty_marker, errorFraction=args.error_fraction, seed=args.seed)
+
+if __name__ == "__main__":
+    argParser = argparse.ArgumentParser(description="Serve a synthetic confex meeting website locally")
+    argParser.add_argument("--people", type=int, default=200)
+    argParser.add_argument("--sessions", type=int, default=80)
+    argParser.add_argument("--port", type=int, default=8021)
+    argParser.add_argument("--roster", help="write the department roster CSV for the scraper's deptListFile to this file")
+    addMeetingArguments(argParser)
+    args = argParser.parse_args()
+
+    meeting = meetingFromArguments(args, args.people, args.sessions)
+    if args.roster:
+        meeting.writeRoster(args.roster)
+        print("Wrote roster of {} dept. members to {}".format(len(meeting.roster()), args.roster))
+    server, meetingURL = serve(meeting, args.port)
+    print("Serving synthetic meeting at {} (Ctrl-C to stop)".format(meetingURL))
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        server.shutdown()